@@ -1,27 +1,99 @@
 import os
+import io
 import uuid
 import time
 import json
 import csv
+import queue
+import re
+import atexit
+import mimetypes
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from threading import Lock
-from flask import Flask, request, jsonify, send_from_directory
+from urllib.parse import quote
+from threading import Lock, Thread
+from flask import Flask, Response, abort, request, jsonify, send_from_directory
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from extractor import ImportDeclarationExtractor
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # Windows : pas de verrou entre processus (un seul processus sert l'app)
+    HAS_FCNTL = False
+
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-OUTPUT_FOLDER = os.path.join(BASE_DIR, 'outputs')
+TMPFS_ROOT = '/dev/shm'
+
+def resolve_work_dir(env_var, name):
+    """
+    Dossier des fichiers éphémères : variable d'environnement, sinon tmpfs (/dev/shm, en
+    mémoire) s'il est accessible en écriture, sinon un sous-dossier du projet
+    """
+    path = os.environ.get(env_var)
+    if path:
+        return path
+    if os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+        return os.path.join(TMPFS_ROOT, 'project_ocr', name)
+    return os.path.join(BASE_DIR, name)
+
+UPLOAD_FOLDER = resolve_work_dir('OCR_UPLOAD_DIR', 'uploads')
+OUTPUT_FOLDER = resolve_work_dir('OCR_OUTPUT_DIR', 'outputs')
+# Durée de vie des fichiers éphémères (secondes). Nettoyage désactivé par défaut : l'historique
+# garde des liens vers les JSON/CSV individuels, qu'une purge rendrait introuvables (404).
+# À n'activer (OCR_FILE_TTL > 0) que si ces liens n'ont pas à survivre à ce délai.
+FILE_TTL = int(os.environ.get('OCR_FILE_TTL', 0))
+CLEANUP_INTERVAL = 300
 
 # --- Fichiers Maîtres (remplacent la base de données) ---
-MASTER_JSON_PATH = os.path.join(BASE_DIR, 'GLOBAL_HISTORY.json')
+# L'historique est un journal JSONL (un enregistrement par ligne) : on ajoute en fin de fichier
+# sans jamais relire ni réécrire l'existant
+MASTER_JSON_PATH = os.path.join(BASE_DIR, 'GLOBAL_HISTORY.jsonl')
+LEGACY_JSON_PATH = os.path.join(BASE_DIR, 'GLOBAL_HISTORY.json')
 MASTER_CSV_PATH = os.path.join(BASE_DIR, 'GLOBAL_HISTORY.csv')
-# Verrou pour empêcher deux écritures simultanées qui corrompraient les fichiers
-FILE_LOCK = Lock()
+# Verrou flock du CSV maître entre les workers gunicorn (chacun a son thread d'écriture)
+MASTER_CSV_LOCK_PATH = MASTER_CSV_PATH + '.lock'
+HISTORY_LIMIT = 50
+TAIL_CHUNK_SIZE = 64 * 1024
+# Un verrou par fichier maître : une lecture de l'historique ne bloque pas l'écriture du CSV
+JSON_LOCK = Lock()
+CSV_LOCK = Lock()
+
+# File d'attente des écritures maîtres, vidée par un thread dédié (voir master_writer_loop)
+WRITE_Q = queue.Queue()
+WRITER_BATCH_SIZE = 256
+WRITER_BATCH_DELAY = 0.05  # secondes d'attente max pour regrouper les écritures
+
+# Pool de processus pour l'extraction (CPU : parsing PDF + regex), créé à la première requête
+# Sous gunicorn, chaque worker a son propre pool : les cœurs sont partagés entre les
+# OCR_WORKERS workers (même variable que gunicorn.conf.py) pour ne pas créer ~N² processus
+GUNICORN_WORKERS = max(1, int(os.environ.get('OCR_WORKERS', 1)))
+EXTRACT_WORKERS = int(os.environ.get('OCR_EXTRACT_WORKERS', max(1, (os.cpu_count() or 2) // GUNICORN_WORKERS)))
+_EXECUTOR = None
+_EXECUTOR_LOCK = Lock()
+
+# Extracteur unique par processus (les processus du pool en héritent) : la structure
+# des champs n'est construite qu'une fois. Chaque processus du pool ne traite qu'un
+# fichier à la fois, l'état interne de l'extracteur n'est donc jamais partagé.
+# Les fichiers sont déjà répartis entre les processus : pas de second pool par page (page_workers=1).
+# OCR_RESULT_CACHE : chemin d'une base SQLite où réutiliser les résultats des PDF déjà traités.
+# OCR_LAYOUT_ENGINE : 'pymupdf' pour un texte de page bien plus rapide (PyMuPDF), au prix de l'alignement des colonnes.
+# OCR_PATTERN_ENGINE : 'regex' pour des recherches qui relâchent le GIL (threads gunicorn en parallèle).
+EXTRACTOR = ImportDeclarationExtractor(page_workers=1, cache_path=os.environ.get('OCR_RESULT_CACHE'),
+                                       layout_engine=os.environ.get('OCR_LAYOUT_ENGINE', 'pdfplumber'),
+                                       pattern_engine=os.environ.get('OCR_PATTERN_ENGINE', 're'))
 
 for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
     os.makedirs(folder, exist_ok=True)
@@ -29,14 +101,95 @@ for folder in [UPLOAD_FOLDER, OUTPUT_FOLDER]:
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
+# Derrière Apache (mod_xsendfile) : Flask délègue l'envoi des fichiers via X-Sendfile
+app.config['USE_X_SENDFILE'] = os.environ.get('OCR_USE_X_SENDFILE', '0') == '1'
+
+# Derrière nginx : préfixes des `location ... { internal; }` qui pointent vers les dossiers
+# de sortie et des fichiers maîtres. Vides = fichiers envoyés par Flask.
+#   location /_internal_outputs/ { internal; alias /chemin/vers/outputs/; }
+ACCEL_OUTPUTS_PREFIX = os.environ.get('OCR_ACCEL_OUTPUTS_PREFIX', '')
+ACCEL_MASTER_PREFIX = os.environ.get('OCR_ACCEL_MASTER_PREFIX', '')
+
+# --- Noms de fichiers déposés ---
+ALLOWED_EXTENSIONS = frozenset({'.pdf', '.txt'})
+_UNSAFE_FILENAME = re.compile(r'[^A-Za-z0-9._-]')
+
+MAX_FILENAME_LENGTH = 128
+
+def safe_filename(filename):
+    """
+    Version spécialisée de secure_filename : dernier composant du chemin, caractères hors
+    [A-Za-z0-9._-] remplacés par '_', sans point initial, limité à 128 caractères
+    (le nom est raccourci avant l'extension, qui décide du format accepté)
+    """
+    name = filename.replace('\\', '/').rpartition('/')[2]
+    name = _UNSAFE_FILENAME.sub('_', name).lstrip('.')
+    if len(name) <= MAX_FILENAME_LENGTH:
+        return name
+    ext = file_extension(name)
+    if len(ext) >= MAX_FILENAME_LENGTH:
+        return name[:MAX_FILENAME_LENGTH]
+    return name[:MAX_FILENAME_LENGTH - len(ext)] + name[len(name) - len(ext):]
+
+def file_extension(name):
+    """Extension en minuscules avec le point ('' si absente)"""
+    _, dot, ext = name.rpartition('.')
+    return '.' + ext.lower() if dot else ''
+
+# --- Sérialisation JSON (orjson si disponible, sinon bibliothèque standard) ---
+def _dump_line(obj):
+    """Sérialise un enregistrement en une ligne JSONL (bytes UTF-8, saut de ligne inclus)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8') + b"\n"
+
+def _loads(raw):
+    """Désérialise du JSON (str ou bytes)"""
+    return orjson.loads(raw) if HAS_ORJSON else json.loads(raw)
+
+# --- Écritures atomiques ---
+def fsync_dir(path):
+    """Rend durables les créations/renommages de fichiers dans le dossier `path`"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Dossiers non ouvrables (Windows) : le renommage reste atomique
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def write_atomic(path, payload):
+    """Écrit `payload` dans un fichier temporaire voisin, le synchronise puis remplace `path`"""
+    tmp_path = f"{path}.tmp.{uuid.uuid4().hex}"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
 
 # --- Initialisation des fichiers maîtres ---
+def migrate_legacy_history():
+    """Convertit l'ancien GLOBAL_HISTORY.json (tableau unique) en journal JSONL"""
+    if not os.path.exists(LEGACY_JSON_PATH) or os.path.exists(MASTER_JSON_PATH):
+        return
+    try:
+        with open(LEGACY_JSON_PATH, 'rb') as f:
+            data = _loads(f.read())
+    except (OSError, json.JSONDecodeError):
+        data = []
+
+    # Écriture dans un fichier temporaire puis renommage atomique : un arrêt brutal
+    # ne laisse jamais de journal à moitié converti
+    write_atomic(MASTER_JSON_PATH, b"".join(_dump_line(record) for record in data))
+    # On garde l'ancien fichier de côté plutôt que de le supprimer
+    os.replace(LEGACY_JSON_PATH, LEGACY_JSON_PATH + '.migrated')
+
 def init_master_files():
-    with FILE_LOCK:
-        # Si le JSON maître n'existe pas, on le crée avec une liste vide
-        if not os.path.exists(MASTER_JSON_PATH):
-            with open(MASTER_JSON_PATH, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+    with JSON_LOCK:
+        migrate_legacy_history()
+        # Si le journal maître n'existe pas, on le crée vide (sans tronquer un journal existant)
+        open(MASTER_JSON_PATH, 'ab').close()
         
         # Pour le CSV maître, on attendra la première extraction pour connaître les en-têtes exacts,
         # ou on peut l'initialiser plus tard.
@@ -44,29 +197,382 @@ def init_master_files():
 init_master_files()
 
 # --- Fonctions utilitaires pour les fichiers maîtres ---
-def append_to_master_json(record):
-    """Lit tout le JSON, ajoute l'enregistrement, et réécrit tout (sécurisé par Lock)"""
-    with FILE_LOCK:
+# Descripteur du journal ouvert une seule fois en O_APPEND (voir master_json_fd)
+_MASTER_JSON_FD = None
+
+def master_json_fd():
+    """Ouvre le journal maître à la première écriture puis réutilise le même descripteur"""
+    global _MASTER_JSON_FD
+    if _MASTER_JSON_FD is None:
+        _MASTER_JSON_FD = os.open(MASTER_JSON_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    return _MASTER_JSON_FD
+
+def append_to_master_json(records):
+    """Ajoute des lignes au journal JSONL maître en un seul write(2) (sécurisé par Lock)"""
+    payload = memoryview(b"".join(_dump_line(r) for r in records))
+    with JSON_LOCK:
+        fd = master_json_fd()
+        while payload:
+            written = os.write(fd, payload)
+            payload = payload[written:]
+        os.fsync(fd)
+
+def read_master_json_tail(limit=HISTORY_LIMIT):
+    """
+    Lit les `limit` dernières lignes du journal en remontant depuis la fin du fichier
+    par blocs de 64 Ko : le coût ne dépend pas de la taille de l'historique.
+    Renvoie les enregistrements du plus récent au plus ancien.
+    """
+    with open(MASTER_JSON_PATH, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        # limit + 1 sauts de ligne garantissent `limit` lignes complètes
+        while pos > 0 and buf.count(b"\n") <= limit:
+            step = min(TAIL_CHUNK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+
+    records = []
+    for line in reversed(buf.splitlines()[-limit:]):
+        if not line.strip():
+            continue
         try:
-            with open(MASTER_JSON_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            data = []
-        
-        data.append(record)
-        
-        with open(MASTER_JSON_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-
-def append_to_master_csv(flat_data):
-    """Ajoute une ligne au CSV maître (sécurisé par Lock)"""
-    with FILE_LOCK:
-        file_exists = os.path.exists(MASTER_CSV_PATH)
-        with open(MASTER_CSV_PATH, 'a', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=flat_data.keys())
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(flat_data)
+            records.append(_loads(line))
+        except json.JSONDecodeError:
+            continue  # Ligne tronquée (écriture interrompue) : on l'ignore
+    return records
+
+# CSV maître : un seul fichier bufferisé et un seul DictWriter pour tout le processus
+MASTER_CSV_BUFFER = 1 << 20
+_MASTER_CSV_FH = None
+_MASTER_CSV_WRITER = None
+
+def read_master_csv_header():
+    """Renvoie les colonnes du CSV maître existant, ou None s'il est absent ou vide"""
+    try:
+        with open(MASTER_CSV_PATH, 'r', newline='', encoding='utf-8-sig') as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+def open_master_csv(fieldnames):
+    """(Ré)ouvre le CSV maître en ajout et prépare le DictWriter partagé"""
+    global _MASTER_CSV_FH, _MASTER_CSV_WRITER
+    header = read_master_csv_header()
+    _MASTER_CSV_FH = open(MASTER_CSV_PATH, 'a', buffering=MASTER_CSV_BUFFER, newline='', encoding='utf-8-sig')
+    _MASTER_CSV_WRITER = csv.DictWriter(_MASTER_CSV_FH, fieldnames=header or list(fieldnames), restval='')
+    if header is None:
+        _MASTER_CSV_WRITER.writeheader()
+
+def close_master_csv():
+    global _MASTER_CSV_FH, _MASTER_CSV_WRITER
+    if _MASTER_CSV_FH is not None:
+        _MASTER_CSV_FH.close()
+    _MASTER_CSV_FH = None
+    _MASTER_CSV_WRITER = None
+
+def extend_master_csv_header(fieldnames):
+    """
+    Nouvelles colonnes détectées : réécrit le CSV maître une seule fois avec l'en-tête élargi
+    (les anciennes lignes reçoivent des cellules vides)
+    """
+    close_master_csv()
+    tmp_path = f"{MASTER_CSV_PATH}.tmp.{uuid.uuid4().hex}"
+    with open(MASTER_CSV_PATH, 'r', newline='', encoding='utf-8-sig') as src, \
+         open(tmp_path, 'w', newline='', encoding='utf-8-sig') as dst:
+        writer = csv.DictWriter(dst, fieldnames=fieldnames, restval='')
+        writer.writeheader()
+        writer.writerows(csv.DictReader(src))
+        dst.flush()
+        os.fsync(dst.fileno())
+    # Le lecteur voit soit l'ancien fichier complet, soit le nouveau, jamais un mélange
+    os.replace(tmp_path, MASTER_CSV_PATH)
+    open_master_csv(fieldnames)
+
+@contextmanager
+def master_csv_lock():
+    """
+    Accès exclusif au CSV maître : CSV_LOCK entre les threads du processus, flock sur
+    MASTER_CSV_LOCK_PATH entre les processus (workers gunicorn)
+    """
+    with CSV_LOCK:
+        if not HAS_FCNTL:
+            yield
+            return
+        with open(MASTER_CSV_LOCK_PATH, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def master_csv_replaced():
+    """Vrai si le CSV maître ouvert a été remplacé (en-tête élargi) ou supprimé par un autre processus"""
+    try:
+        return os.stat(MASTER_CSV_PATH).st_ino != os.fstat(_MASTER_CSV_FH.fileno()).st_ino
+    except FileNotFoundError:
+        return True
+
+def append_to_master_csv(rows):
+    """
+    Ajoute des lignes au CSV maître via le descripteur persistant. Sous verrou entre processus,
+    le fichier est rouvert (et son en-tête relu) si un autre worker l'a remplacé entre-temps.
+    """
+    with master_csv_lock():
+        if _MASTER_CSV_WRITER is not None and master_csv_replaced():
+            close_master_csv()
+        if _MASTER_CSV_WRITER is None:
+            open_master_csv(rows[0].keys())
+        known = _MASTER_CSV_WRITER.fieldnames
+        new_columns = [k for row in rows for k in row if k not in known]
+        if new_columns:
+            extend_master_csv_header(list(known) + list(dict.fromkeys(new_columns)))
+        _MASTER_CSV_WRITER.writerows(rows)
+        _MASTER_CSV_FH.flush()
+        os.fsync(_MASTER_CSV_FH.fileno())
+
+# --- Écrivain en arrière-plan ---
+def enqueue_master_write(json_records, csv_rows):
+    """Confie les enregistrements d'une requête au thread d'écriture et rend la main"""
+    if json_records or csv_rows:
+        ensure_master_writer()
+        WRITE_Q.put((json_records, csv_rows))
+
+def flush_master_batch(batch):
+    """
+    Écrit un lot de requêtes : une écriture et un fsync par fichier maître,
+    puis un seul fsync du dossier pour les fichiers créés ou renommés pendant le lot
+    """
+    json_records = [record for records, _ in batch for record in records]
+    csv_rows = [row for _, rows in batch for row in rows]
+    if json_records:
+        append_to_master_json(json_records)
+    if csv_rows:
+        append_to_master_csv(csv_rows)
+    fsync_dir(BASE_DIR)
+
+def master_writer_loop():
+    """Regroupe les écritures (jusqu'à WRITER_BATCH_SIZE ou WRITER_BATCH_DELAY) puis les vide"""
+    running = True
+    while running:
+        item = WRITE_Q.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = time.monotonic() + WRITER_BATCH_DELAY
+        while len(batch) < WRITER_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = WRITE_Q.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                running = False
+                break
+            batch.append(item)
+        try:
+            flush_master_batch(batch)
+        except Exception as e:
+            # Le thread ne doit jamais mourir : on signale et on continue
+            print(f"Erreur d'écriture des fichiers maîtres: {e}")
+
+def ensure_master_writer():
+    """
+    Démarre le thread d'écriture dans le processus courant. Sous gunicorn (preload_app),
+    le module est importé par le maître puis les workers sont forkés : un thread démarré
+    à l'import n'existerait pas dans les workers, d'où ce démarrage paresseux par PID.
+    """
+    global MASTER_WRITER, _WRITER_PID
+    if _WRITER_PID == os.getpid():
+        return
+    with _WRITER_START_LOCK:
+        if _WRITER_PID != os.getpid():
+            MASTER_WRITER = Thread(target=master_writer_loop, name="master-writer", daemon=True)
+            MASTER_WRITER.start()
+            _WRITER_PID = os.getpid()
+            atexit.register(stop_master_writer)
+
+def stop_master_writer():
+    """Vide la file avant l'arrêt du processus"""
+    global _MASTER_JSON_FD, _WRITER_PID
+    if _WRITER_PID != os.getpid():
+        return  # Aucun thread d'écriture dans ce processus (ou déjà arrêté)
+    WRITE_Q.put(None)
+    MASTER_WRITER.join(timeout=5)
+    _WRITER_PID = None
+    with JSON_LOCK:
+        if _MASTER_JSON_FD is not None:
+            os.close(_MASTER_JSON_FD)
+            _MASTER_JSON_FD = None
+    with CSV_LOCK:
+        close_master_csv()
+
+MASTER_WRITER = None
+_WRITER_PID = None
+_WRITER_START_LOCK = Lock()
+
+# --- Nettoyage des fichiers éphémères ---
+def purge_old_files(folder, max_age):
+    """Supprime les fichiers de `folder` modifiés il y a plus de `max_age` secondes"""
+    limit = time.time() - max_age
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue  # Déjà supprimé par un autre worker
+
+def cleanup_loop():
+    while True:
+        for folder in (app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER']):
+            try:
+                purge_old_files(folder, FILE_TTL)
+            except OSError as e:
+                print(f"Erreur lors du nettoyage de {folder}: {e}")
+        time.sleep(min(CLEANUP_INTERVAL, FILE_TTL))
+
+_CLEANER_PID = None
+
+def ensure_cleanup_thread():
+    """Démarre le nettoyage périodique dans le processus courant (même logique que ensure_master_writer)"""
+    global _CLEANER_PID
+    if FILE_TTL <= 0 or _CLEANER_PID == os.getpid():
+        return
+    with _WRITER_START_LOCK:
+        if _CLEANER_PID != os.getpid():
+            Thread(target=cleanup_loop, name="tmp-cleaner", daemon=True).start()
+            _CLEANER_PID = os.getpid()
+
+# --- Extraction (exécutée dans les processus du pool) ---
+def get_executor():
+    """Crée le pool de processus à la première utilisation"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS)
+        return _EXECUTOR
+
+def discard_executor(broken):
+    """
+    Écarte un pool cassé (processus tué : mémoire, plantage d'une bibliothèque native) :
+    le prochain appel à get_executor en crée un neuf
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is broken:
+            _EXECUTOR = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def upload_error(task_id, original_name, error):
+    """(enregistrement historique, None, résultat API) d'un fichier dont l'extraction a échoué"""
+    # En cas d'erreur, on l'ajoute aussi à l'historique JSON pour garder une trace
+    error_record = {
+        "id": task_id, "filename": original_name, "date": datetime.now().isoformat(),
+        "status": "error", "error_msg": str(error), "fields_found": 0, "total_fields": 0,
+        "json_path": "", "csv_path": ""
+    }
+    return error_record, None, {"filename": original_name, "status": "error", "error": str(error)}
+
+def run_extractions(jobs, folders):
+    """
+    Lance les extractions dans le pool et renvoie leurs résultats dans l'ordre des fichiers.
+    Un fichier dont le processus meurt (ou dont la tâche lève) devient une erreur de ce seul
+    fichier, comme en traitement séquentiel ; un pool cassé est remplacé pour les requêtes suivantes.
+    """
+    executor = get_executor()
+    try:
+        futures = [executor.submit(process_upload, *job, folders) for job in jobs]
+    except BrokenProcessPool:
+        # Pool déjà cassé par une requête précédente : un pool neuf pour celle-ci
+        discard_executor(executor)
+        executor = get_executor()
+        futures = [executor.submit(process_upload, *job, folders) for job in jobs]
+
+    outcomes = []
+    broken = False
+    for (task_id, _, _, original_name), future in zip(jobs, futures):
+        try:
+            outcomes.append(future.result())
+        except BrokenProcessPool as e:
+            broken = True
+            outcomes.append(upload_error(task_id, original_name, f"Processus d'extraction interrompu ({e})"))
+        except Exception as e:
+            outcomes.append(upload_error(task_id, original_name, e))
+    if broken:
+        discard_executor(executor)
+    return outcomes
+
+def process_upload(task_id, content, file_ext, original_name, folders):
+    """
+    Extrait un fichier déposé (contenu en bytes) et écrit ses fichiers individuels.
+    `folders` = (dossier temporaire, dossier de sortie).
+    Renvoie (enregistrement historique, ligne CSV maître ou None, résultat API).
+    """
+    spool_folder, output_folder = folders
+    # Horodatage unique pour tout le fichier (noms de sortie, historique, CSV maître)
+    now = datetime.now()
+    now_iso = now.isoformat()
+    try:
+        extractor = EXTRACTOR
+        # 1. Extraction directement depuis la mémoire
+        if file_ext == '.pdf':
+            # Un PDF déjà traité est servi depuis le cache (empreinte du contenu)
+            data = extractor.extract_pdf_data(content, spool_dir=spool_folder)
+        else:
+            data = extractor.extract_all_fields(content.decode('utf-8'))
+
+        # 2. Sauvegarde des fichiers INDIVIDUELS (pour téléchargement immédiat facile)
+        base_name = f"SGS_{now.strftime('%Y%m%d')}_{task_id[:6]}"
+        json_link = f"{base_name}.json"
+        csv_link = f"{base_name}.csv"
+        # Les données sont aplaties une seule fois, pour le CSV individuel et le CSV maître
+        # (les stats techniques sont écartées pour que le CSV métier reste propre)
+        flat_data = extractor._flatten_results(data)
+        # JSON individuel destiné au téléchargement : gardé lisible
+        extractor.save_to_json(data, os.path.join(output_folder, json_link), pretty=True, include_statistics=True)
+        extractor.save_to_csv(data, os.path.join(output_folder, csv_link), flat_data=flat_data)
+
+        # 3. Ajout aux fichiers MAÎTRES (GLOBAL_HISTORY)
+        stats = data['_statistics']
+
+        # Préparation de l'enregistrement pour l'historique JSON Master
+        history_record = {
+            "id": task_id,
+            "filename": original_name,
+            "date": now_iso,
+            "status": "success",
+            "fields_found": stats['extracted_fields'],
+            "total_fields": stats['total_fields'],
+            # On garde les liens vers les fichiers individuels pour le téléchargement depuis l'historique
+            "json_path": json_link, 
+            "csv_path": csv_link,
+            # Optionnel : on peut aussi sauvegarder TOUTES les données extraites dans l'historique JSON
+            # "full_data": data 
+        }
+
+        # Préparation et ajout au Master CSV
+        # On reprend les données aplaties et on ajoute des colonnes utiles au début
+        master_csv_record = {
+            "Extraction_ID": task_id,
+            "Date_Extraction": now.strftime('%Y-%m-%d %H:%M:%S'),
+            "Fichier_Source": original_name,
+            **flat_data
+        }
+
+        return history_record, master_csv_record, {
+            "filename": original_name,
+            "status": "success",
+            "stats": stats,
+            "downloads": {"json": f"/api/download/{json_link}", "csv": f"/api/download/{csv_link}"}
+        }
+
+    except Exception as e:
+        return upload_error(task_id, original_name, e)
 
 # --- Endpoints API ---
 
@@ -76,15 +582,16 @@ def health_check():
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
-    """Lit le fichier JSON maître pour le dashboard"""
+    """Lit la fin du journal JSONL maître pour le dashboard"""
     try:
-        with FILE_LOCK:
-            if not os.path.exists(MASTER_JSON_PATH):
-                 return jsonify([])
-            with open(MASTER_JSON_PATH, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        # On renvoie les 50 derniers, inversés pour avoir les plus récents en premier
-        return jsonify(data[-50:][::-1])
+        # Pas de verrou : le journal n'est modifié que par ajout ou remplacement atomique,
+        # et une dernière ligne incomplète est ignorée par read_master_json_tail.
+        # init_master_files a créé le journal : pas de stat() à chaque requête.
+        # On renvoie les 50 derniers, les plus récents en premier
+        data = read_master_json_tail(HISTORY_LIMIT)
+        return jsonify(data)
+    except FileNotFoundError:
+        return jsonify([])
     except Exception as e:
         return jsonify([]), 200 # En cas d'erreur (ex: fichier vide), on renvoie une liste vide
 
@@ -93,102 +600,99 @@ def batch_extract():
     if 'files' not in request.files:
         return jsonify({"error": "Aucun fichier détecté"}), 400
     
+    ensure_cleanup_thread()
     files = request.files.getlist('files')
     results = []
+    # Les enregistrements maîtres sont accumulés puis écrits une seule fois en fin de requête
+    json_batch = []
+    csv_batch = []
 
+    # 1. Lecture séquentielle des fichiers reçus (rapide)
+    jobs = []
     for file in files:
         if file.filename == '': continue
         
         task_id = str(uuid.uuid4())
-        original_name = secure_filename(file.filename)
-        file_ext = os.path.splitext(original_name)[1].lower()
+        original_name = safe_filename(file.filename)
+        file_ext = file_extension(original_name)
         
-        if file_ext not in ['.pdf', '.txt']:
+        if file_ext not in ALLOWED_EXTENSIONS:
             results.append({"filename": original_name, "status": "error", "error": "Format invalide"})
             continue
 
-        temp_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{task_id}{file_ext}")
-        file.save(temp_path)
+        # Le contenu est lu en mémoire et transmis tel quel au processus d'extraction
+        jobs.append((task_id, file.stream.read(), file_ext, original_name))
+        results.append(None)  # Place réservée pour garder l'ordre des fichiers
 
-        try:
-            extractor = ImportDeclarationExtractor()
-            # 1. Extraction
-            text = extractor.extract_from_pdf(temp_path) if file_ext == '.pdf' else open(temp_path, 'r', encoding='utf-8').read()
-            data = extractor.extract_all_fields(text)
-            
-            # 2. Sauvegarde des fichiers INDIVIDUELS (pour téléchargement immédiat facile)
-            base_name = f"SGS_{datetime.now().strftime('%Y%m%d')}_{task_id[:6]}"
-            json_link = f"{base_name}.json"
-            csv_link = f"{base_name}.csv"
-            extractor.save_to_json(data, os.path.join(app.config['OUTPUT_FOLDER'], json_link))
-            extractor.save_to_csv(data, os.path.join(app.config['OUTPUT_FOLDER'], csv_link))
-
-            # 3. Ajout aux fichiers MAÎTRES (GLOBAL_HISTORY)
-            stats = data['_statistics']
-            
-            # Préparation de l'enregistrement pour l'historique JSON Master
-            history_record = {
-                "id": task_id,
-                "filename": original_name,
-                "date": datetime.now().isoformat(),
-                "status": "success",
-                "fields_found": stats['extracted_fields'],
-                "total_fields": stats['total_fields'],
-                # On garde les liens vers les fichiers individuels pour le téléchargement depuis l'historique
-                "json_path": json_link, 
-                "csv_path": csv_link,
-                # Optionnel : on peut aussi sauvegarder TOUTES les données extraites dans l'historique JSON
-                # "full_data": data 
-            }
-            append_to_master_json(history_record)
-
-            # Préparation et ajout au Master CSV
-            # On aplatit les données et on ajoute les métadonnées (date, nom fichier...)
-            flat_data = extractor._flatten_dict(data)
-            # On retire les stats techniques du CSV métier pour qu'il reste propre
-            keys_to_remove = [k for k in flat_data.keys() if k.startswith('_statistics')]
-            for k in keys_to_remove:
-                del flat_data[k]
-            # On ajoute des colonnes utiles au début
-            master_csv_record = {
-                "Extraction_ID": task_id,
-                "Date_Extraction": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                "Fichier_Source": original_name,
-                **flat_data
-            }
-            append_to_master_csv(master_csv_record)
-
-            results.append({
-                "filename": original_name,
-                "status": "success",
-                "stats": stats,
-                "downloads": {"json": f"/api/download/{json_link}", "csv": f"/api/download/{csv_link}"}
-            })
+    # 2. Extraction en parallèle, un fichier par processus
+    folders = (app.config['UPLOAD_FOLDER'], app.config['OUTPUT_FOLDER'])
+    outcomes = run_extractions(jobs, folders) if jobs else []
 
-        except Exception as e:
-             # En cas d'erreur, on l'ajoute aussi à l'historique JSON pour garder une trace
-            error_record = {
-                "id": task_id, "filename": original_name, "date": datetime.now().isoformat(),
-                "status": "error", "error_msg": str(e), "fields_found": 0, "total_fields": 0,
-                "json_path": "", "csv_path": ""
-            }
-            append_to_master_json(error_record)
-            results.append({"filename": original_name, "status": "error", "error": str(e)})
-        finally:
-            if os.path.exists(temp_path): os.remove(temp_path)
+    slots = [i for i, r in enumerate(results) if r is None]
+    for slot, (history_record, master_csv_record, api_result) in zip(slots, outcomes):
+        json_batch.append(history_record)
+        if master_csv_record is not None:
+            csv_batch.append(master_csv_record)
+        results[slot] = api_result
 
+    enqueue_master_write(json_batch, csv_batch)
     return jsonify({"batch_results": results})
 
+def send_download(directory, filename, accel_prefix):
+    """
+    Envoie un fichier en téléchargement. Avec un préfixe X-Accel-Redirect, la réponse est vide
+    et nginx envoie lui-même le fichier (sendfile) : le worker Python est libéré aussitôt.
+    """
+    if not accel_prefix:
+        return send_from_directory(directory, filename, as_attachment=True)
+
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{quote(filename)}"
+    response.headers.set('Content-Disposition', 'attachment', filename=os.path.basename(filename))
+    return response
+
+def iter_master_json_array():
+    """
+    Le journal JSONL maître présenté comme un tableau JSON ("[", lignes séparées par ",", "]"),
+    lu ligne à ligne sans charger l'historique en mémoire
+    """
+    yield b"["
+    separator = b""
+    with open(MASTER_JSON_PATH, 'rb') as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Dernière ligne sans saut de ligne : écriture en cours ou interrompue
+                try:
+                    _loads(line)
+                except json.JSONDecodeError:
+                    break
+            line = line.strip()
+            if line:
+                yield separator + line
+                separator = b","
+    yield b"]"
+
 @app.route('/api/download/<path:filename>')
 def download_file(filename):
     # Petit hack : si on demande "GLOBAL_CSV", on renvoie le fichier maître
     if filename == "GLOBAL_CSV":
-        return send_from_directory(BASE_DIR, 'GLOBAL_HISTORY.csv', as_attachment=True)
+        return send_download(BASE_DIR, os.path.basename(MASTER_CSV_PATH), ACCEL_MASTER_PREFIX)
     if filename == "GLOBAL_JSON":
-        return send_from_directory(BASE_DIR, 'GLOBAL_HISTORY.json', as_attachment=True)
+        # Le journal est en JSONL : converti à la volée en tableau JSON, le format attendu
+        response = Response(iter_master_json_array(), mimetype='application/json')
+        response.headers.set('Content-Disposition', 'attachment', filename='GLOBAL_HISTORY.json')
+        return response
+    if filename == "GLOBAL_JSONL":
+        # Journal brut (un enregistrement par ligne), envoyé tel quel
+        return send_download(BASE_DIR, os.path.basename(MASTER_JSON_PATH), ACCEL_MASTER_PREFIX)
         
-    return send_from_directory(app.config['OUTPUT_FOLDER'], filename, as_attachment=True)
+    return send_download(app.config['OUTPUT_FOLDER'], filename, ACCEL_OUTPUTS_PREFIX)
 
 if __name__ == '__main__':
+    # Serveur de développement uniquement ; en production : gunicorn -c gunicorn.conf.py app:app
     print("🟢 SERVEUR V2.1 (NO-DB) PRÊT SUR LE PORT 5000")
-    app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    app.run(debug=debug, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file
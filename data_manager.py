@@ -1,12 +1,18 @@
 import pandas as pd
 import os
+import csv
 import uuid
 from datetime import datetime
 
 class DataManager:
     """
-    Gère la persistance des données dans un fichier CSV (CRUD).
-    Simule une base de données simple.
+    Gère la persistance des données dans un fichier CSV ou Parquet (CRUD).
+    Simule une base de données simple. Le format est choisi d'après l'extension
+    de `db_path` : `.parquet` (pyarrow, dépendance optionnelle, compression zstd) ou CSV sinon.
+
+    Parquet ne permet pas l'ajout en place : chaque écriture réécrit tout le fichier. Les ajouts
+    sont donc regroupés et écrits toutes les `parquet_flush_every` lignes, par flush() ou close() ;
+    en cas d'arrêt brutal, les ajouts pas encore écrits sont perdus (1 = écriture à chaque ajout).
     """
     
     # Définition des colonnes de base (schéma de la DB)
@@ -17,20 +23,74 @@ class DataManager:
         'details_fournisseur', 'document_path'
     ]
 
-    def __init__(self, db_path):
+    # Séparateur entre colonnes dans la chaîne de recherche concaténée (absent des termes saisis)
+    _SEARCH_SEP = '\x1f'
+
+    def __init__(self, db_path, parquet_flush_every: int = 100):
         self.db_path = db_path
+        self.is_parquet = str(db_path).lower().endswith('.parquet')
+        self.parquet_flush_every = max(1, parquet_flush_every)
+        # Ajouts Parquet pas encore écrits sur disque
+        self._unsaved = 0
+        # Lignes ajoutées depuis la dernière matérialisation du DataFrame (voir la propriété df)
+        self._pending = []
+        # Colonnes réellement présentes dans l'en-tête du fichier (None si pas d'en-tête)
+        self._disk_columns = None
+        # Fichier ouvert en ajout, réutilisé d'un add_record à l'autre
+        self._append_fh = None
+        self._append_writer = None
+        # Caches de recherche en minuscules, tenus à jour à chaque ajout/modification/suppression
+        self._search_cache = None
+        self._lc_cols = {}
         self._initialize_db()
 
+    @property
+    def df(self) -> pd.DataFrame:
+        """DataFrame complet ; les lignes en attente y sont intégrées en une seule concaténation."""
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._df = pd.concat([self._df, pd.DataFrame(pending)], ignore_index=True)
+            self._extend_search(pending)
+        return self._df
+
+    @df.setter
+    def df(self, value: pd.DataFrame):
+        self._df = value
+        self._pending = []
+        self._invalidate_search()
+
+    def _invalidate_search(self):
+        self._search_cache = None
+        self._lc_cols = {}
+
+    def _extend_search(self, records: list):
+        """Ajoute aux caches de recherche les lignes en attente qui viennent d'être intégrées au DataFrame"""
+        if self._search_cache is not None:
+            rows = [self._SEARCH_SEP.join(record.values()).lower() for record in records]
+            self._search_cache = pd.concat([self._search_cache, pd.Series(rows, dtype=object)], ignore_index=True)
+        for col, cached in self._lc_cols.items():
+            values = [record.get(col, '').lower() for record in records]
+            self._lc_cols[col] = pd.concat([cached, pd.Series(values, dtype=object)], ignore_index=True)
+
+    def _refresh_search_rows(self, index, columns):
+        """Recalcule les caches de recherche des seules lignes modifiées"""
+        if self._search_cache is not None:
+            rows = self._df.loc[index].fillna('').astype(str)
+            self._search_cache.loc[index] = [self._SEARCH_SEP.join(values).lower() for values in rows.itertuples(index=False)]
+        for col in columns:
+            self._lc_cols.pop(col, None)
+
     def _initialize_db(self):
-        """Initialise le fichier CSV s'il n'existe pas."""
+        """Initialise le fichier de la DB s'il n'existe pas."""
         if not os.path.exists(self.db_path):
             self.df = pd.DataFrame(columns=self.DEFAULT_COLUMNS)
             # Sauvegarde avec les colonnes vides
-            self.df.to_csv(self.db_path, index=False)
+            self._save_db()
         else:
             try:
                 # Tente de charger le fichier existant
-                self.df = pd.read_csv(self.db_path, dtype=str)
+                self.df = self._read_db()
+                self._disk_columns = list(self.df.columns)
                 # S'assurer que les colonnes par défaut sont présentes
                 for col in self.DEFAULT_COLUMNS:
                     if col not in self.df.columns:
@@ -49,9 +109,61 @@ class DataManager:
         if 'record_id' not in self.df.columns:
              self.df['record_id'] = [str(uuid.uuid4()) for _ in range(len(self.df))]
 
+    def _read_db(self) -> pd.DataFrame:
+        """Charge le fichier de la DB (toutes les valeurs en chaînes)."""
+        if self.is_parquet:
+            return pd.read_parquet(self.db_path, engine='pyarrow').astype(object)
+        return pd.read_csv(self.db_path, dtype=str)
+
+    def _write_db(self, path: str):
+        if self.is_parquet:
+            self.df.to_parquet(path, engine='pyarrow', compression='zstd', index=False)
+        else:
+            self.df.to_csv(path, index=False)
+
     def _save_db(self):
-        """Sauvegarde le DataFrame dans le fichier CSV."""
-        self.df.to_csv(self.db_path, index=False)
+        """Réécrit tout le fichier de la DB (fichier temporaire puis remplacement atomique)."""
+        self._close_append()
+        tmp_path = f"{self.db_path}.tmp.{uuid.uuid4().hex}"
+        self._write_db(tmp_path)
+        # Le contenu doit être sur disque avant le renommage, sinon un arrêt brutal
+        # peut laisser un fichier vide à la place de la DB
+        with open(tmp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.db_path)
+        self._disk_columns = list(self.df.columns)
+        self._unsaved = 0
+
+    def _append_row(self, record: dict):
+        """Ajoute une ligne en fin de fichier sans réécrire l'existant."""
+        if self._append_writer is None:
+            self._append_fh = open(self.db_path, 'a', newline='', encoding='utf-8')
+            # Fins de ligne '\n' comme DataFrame.to_csv (en-tête et réécritures) : pas de fichier mixte
+            self._append_writer = csv.DictWriter(self._append_fh, fieldnames=self._disk_columns, restval='',
+                                                 lineterminator='\n')
+        self._append_writer.writerow(record)
+        self._append_fh.flush()
+
+    def _close_append(self):
+        if self._append_fh is not None:
+            self._append_fh.close()
+        self._append_fh = None
+        self._append_writer = None
+
+    def export_csv(self, output_path: str) -> str:
+        """Exporte la DB en CSV lisible (utile quand elle est stockée en Parquet)."""
+        self.df.to_csv(output_path, index=False)
+        return output_path
+
+    def flush(self):
+        """Écrit sur disque les ajouts Parquet en attente."""
+        if self._unsaved:
+            self._save_db()
+
+    def close(self):
+        """Écrit les ajouts en attente et ferme le fichier maintenu ouvert pour les ajouts."""
+        self.flush()
+        self._close_append()
 
     def add_record(self, data: dict):
         """Ajoute un nouvel enregistrement."""
@@ -68,17 +180,23 @@ class DataManager:
         for key, value in data.items():
             new_record[key] = str(value) if value is not None else ''
 
-        # Convertir le dictionnaire en DataFrame d'une seule ligne
-        new_row_df = pd.DataFrame([new_record])
-        
         # Assurer que toutes les colonnes par défaut sont présentes dans la nouvelle ligne
         for col in self.DEFAULT_COLUMNS:
-            if col not in new_row_df.columns:
-                new_row_df[col] = ''
-        
-        # Concaténer la nouvelle ligne
-        self.df = pd.concat([self.df, new_row_df], ignore_index=True)
-        self._save_db()
+            new_record.setdefault(col, '')
+
+        # La ligne est mise en attente : pas de concaténation du DataFrame à chaque ajout
+        self._pending.append(new_record)
+
+        if self.is_parquet:
+            # Parquet ne permet pas l'ajout en place : réécriture groupée (voir parquet_flush_every)
+            self._unsaved += 1
+            if self._unsaved >= self.parquet_flush_every:
+                self._save_db()
+        elif self._disk_columns is not None and all(key in self._disk_columns for key in new_record):
+            self._append_row(new_record)
+        else:
+            # Une nouvelle colonne (ou un fichier sans en-tête) impose de réécrire l'en-tête
+            self._save_db()
         return new_id
 
     def get_all_records(self) -> pd.DataFrame:
@@ -104,35 +222,57 @@ class DataManager:
                  self.df[key] = ''
                  self.df.loc[index, key] = str(value) if value is not None else ''
 
+        self._refresh_search_rows(index, updated_data.keys())
         self._save_db()
 
     def delete_record(self, record_id: str):
         """Supprime un enregistrement par son ID."""
         initial_len = len(self.df)
-        self.df = self.df[self.df['record_id'] != record_id]
+        keep = self.df['record_id'] != record_id
+        search_cache, lc_cols = self._search_cache, self._lc_cols
+        self.df = self.df[keep]
         
         if len(self.df) == initial_len:
             raise ValueError(f"Enregistrement avec ID {record_id} non trouvé.")
+
+        # Les caches gardent le même index que le DataFrame : on les filtre avec le même masque
+        if search_cache is not None:
+            self._search_cache = search_cache[keep]
+        self._lc_cols = {col: cached[keep] for col, cached in lc_cols.items()}
             
         self._save_db()
 
+    def _search_haystack(self) -> pd.Series:
+        """Toutes les colonnes concaténées et passées en minuscules, une chaîne par ligne."""
+        if self._search_cache is None:
+            temp_df = self.df.fillna('').astype(str)
+            columns = [temp_df[col] for col in temp_df.columns]
+            self._search_cache = columns[0].str.cat(columns[1:], sep=self._SEARCH_SEP).str.lower()
+        return self._search_cache
+
+    def _lowercase_column(self, column: str) -> pd.Series:
+        """Colonne en minuscules, mise en cache entre deux recherches."""
+        if column not in self._lc_cols:
+            self._lc_cols[column] = self.df[column].fillna('').astype(str).str.lower()
+        return self._lc_cols[column]
+
     def search_records(self, term: str, column: str = None) -> pd.DataFrame:
         """Recherche des enregistrements par terme dans une colonne spécifique ou toutes les colonnes."""
         term = str(term).strip().lower()
         if not term:
             return pd.DataFrame(columns=self.DEFAULT_COLUMNS) # Retourne un DF vide
-        
-        # Remplacer les NaN par des chaînes vides pour la recherche
-        temp_df = self.df.fillna('')
 
-        if column and column in temp_df.columns:
+        # Intègre les lignes en attente avant de consulter les caches
+        df = self.df
+
+        if column and column in df.columns:
             # Recherche dans une colonne spécifique
-            results = temp_df[temp_df[column].str.lower().str.contains(term, na=False)]
+            haystack = self._lowercase_column(column)
         else:
-            # Recherche dans toutes les colonnes
-            mask = temp_df.apply(
-                lambda row: row.astype(str).str.lower().str.contains(term, na=False).any(), axis=1
-            )
-            results = temp_df[mask]
+            # Recherche dans toutes les colonnes en une seule passe vectorisée
+            haystack = self._search_haystack()
+        mask = haystack.str.contains(term, regex=False)
 
-        return results.sort_values(by='date_ajout', ascending=False)
\ No newline at end of file
+        # Remplacer les NaN par des chaînes vides dans les résultats
+        results = df[mask].fillna('')
+        return results.sort_values(by='date_ajout', ascending=False)
@@ -4,29 +4,885 @@ Version Entreprise - Optimisée pour Flask API
 Compatible avec app.py et data_manager.py
 """
 
+import io
+import os
 import re
 import json
 import csv
-from typing import Dict, List, Optional, Any, Union
+import mmap
+import copy
+import hashlib
+import importlib.util
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+try:
+    from re import _parser as sre_parse, _compiler as sre_compile
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_compile
+from typing import Dict, Iterable, List, NamedTuple, Optional, Any, Union, BinaryIO
 from pathlib import Path
 from datetime import datetime
-import PyPDF2
 
 try:
-    import pdfplumber
-    import camelot
-    import pandas as pd
-    ADVANCED_EXTRACTION = True
+    import PyPDF2
+    HAS_PYPDF2 = True
+except ImportError:
+    HAS_PYPDF2 = False
+
+try:
+    import pypdfium2 as pdfium
+    HAS_PDFIUM = True
+except ImportError:
+    HAS_PDFIUM = False
+
+try:
+    import pymupdf
+    HAS_PYMUPDF = True
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+        HAS_PYMUPDF = True
+    except ImportError:
+        HAS_PYMUPDF = False
+
+try:
+    from blake3 import blake3 as content_hash
+except ImportError:
+    content_hash = hashlib.blake2b
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    import hyperscan
+    HAS_HYPERSCAN = True
+except ImportError:
+    HAS_HYPERSCAN = False
+
+try:
+    import re2
+    HAS_RE2 = True
+except ImportError:
+    HAS_RE2 = False
+
+try:
+    import regex
+    HAS_REGEX = True
 except ImportError:
-    ADVANCED_EXTRACTION = False
+    HAS_REGEX = False
+
+# Extraction avancée : pdfplumber, camelot et pandas sont lourds à charger (camelot tire OpenCV et
+# Ghostscript) ; leur présence est vérifiée ici, l'import n'a lieu qu'au premier usage (_load_advanced)
+ADVANCED_EXTRACTION = all(importlib.util.find_spec(name) is not None
+                          for name in ("pdfplumber", "camelot", "pandas"))
+pdfplumber = camelot = pd = None
+
+
+def _load_advanced():
+    """Importe pdfplumber, camelot et pandas dans le module, une seule fois par processus"""
+    global pdfplumber, camelot, pd, ADVANCED_EXTRACTION
+    if camelot is not None:
+        return
+    try:
+        import pdfplumber as _pdfplumber
+        import pandas as _pd
+        import camelot as _camelot
+    except ImportError:
+        ADVANCED_EXTRACTION = False
+        raise
+    pdfplumber, pd, camelot = _pdfplumber, _pd, _camelot
+
+# Options communes à tous les patterns de la structure
+PATTERN_FLAGS = re.MULTILINE | re.DOTALL | re.IGNORECASE
+
+# Sentinelles (sous-chaînes obligatoires) : longueur minimale pour valoir un test
+MIN_SENTINEL_LENGTH = 3
+# Lettres qu'IGNORECASE rapproche de caractères non ASCII dont la minuscule diffère
+# (İ, ı pour i ; ſ pour s) : elles ne peuvent pas être cherchées dans text.lower()
+_CASE_UNSAFE = frozenset("iIsS")
+# Début de recherche (voir pattern_prefix) : au-delà de ce décalage entre le début d'une
+# correspondance et sa suite littérale, le gain ne vaut plus
+PREFIX_MAX_OFFSET = 256
+
+# Préfiltre Hyperscan : mode PREFILTER (sur-approximation, jamais de faux négatif), UTF-8 avec
+# propriétés Unicode, une seule notification par pattern. Il n'est appliqué qu'aux textes en
+# Latin-1, où \s, \d, \w et IGNORECASE de `re` et d'Hyperscan coïncident : sont exclus les
+# séparateurs \x1c-\x1f (espaces pour `re` seulement), µ (repli vers le mu grec) et les
+# chiffres en exposant / fractions (\w pour `re`).
+if HAS_HYPERSCAN:
+    HS_FLAGS = (hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_DOTALL | hyperscan.HS_FLAG_MULTILINE
+                | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+                | hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_ALLOWEMPTY)
+# Répétitions bornées {0,N} (N >= 10) remplacées par * dans les expressions Hyperscan
+_HS_LONG_GAP = re.compile(r"(?<!\\)\{0,\d{2,}\}")
+_HS_UNSAFE_CHARS = re.compile('[^\x00-\x1b\x20-\x7f\xa0-\xb1\xb4\xb6-\xb8\xba\xbb\xbf-\xfe]')
+
+# Recherche sur le texte encodé en Latin-1 (octets) : même résultat qu'en str, et mêmes positions
+# (un caractère = un octet), sauf là où `re` applique des règles Unicode. Chaque pattern porte
+# un masque des règles dont il dépend, chaque texte un masque des caractères concernés ; le
+# pattern n'est lancé sur les octets que si les deux masques sont disjoints.
+BYTES_WORD = 1   # \w, \b ou lettre non ASCII dans le pattern / lettre ou chiffre non ASCII dans le texte
+BYTES_SPACE = 2  # \s dans le pattern / \x1c-\x1f, \x85 ou \xa0 (espaces pour `re` en str) dans le texte
+RE2_VTAB = 4     # \s dans le pattern / \v dans le texte (espace pour `re`, pas pour RE2)
+_WORD_RULES = re.compile(r"\\[wWbB]")
+_SPACE_RULES = re.compile(r"\\[sS]")
+_NON_ASCII_WORD = re.compile(r"(?![\x00-\x7f])\w")
+_UNICODE_SPACES = re.compile("[\x1c-\x1f\x85\xa0]")
+
+# RE2 (optionnel) : automate sans retour arrière, temps linéaire même sur un texte OCR dégradé.
+# Il travaille sur les mêmes octets Latin-1 que la recherche `re` sur octets, avec les mêmes
+# règles d'éligibilité (plus RE2_VTAB) ; les patterns qu'il refuse (lookahead...) restent sur `re`.
+RE2_MAX_MEM = 8 << 20
+
+# Attributs des tableaux Camelot qui retiennent la mise en page et l'image de la page
+# (les noms varient selon les versions ; seuls ceux présents sont vidés)
+_CAMELOT_PAGE_ATTRS = ("cells", "_text", "textlines", "_textedges", "_segments", "_image",
+                       "_image_path", "imagename", "page_backend", "parse", "parse_details")
+
+# Disposition des tableaux (zones, colonnes) quand aucune n'est connue : page entière
+NO_TABLE_LAYOUT = (None, None)
+
+# Pages dont le texte des tableaux reste en cache (voir _page_table_texts)
+TABLE_CACHE_SIZE = 64
+
+# Marge (caractères) ajoutée autour de chaque section en mode use_regions : les formulaires
+# en colonnes mêlent souvent la fin d'une section au début de la suivante
+REGION_MARGIN = 800
+
+# Écart entre deux libellés d'un pattern : au plus LABEL_GAP_LINES lignes, plus le début de la
+# dernière (même ordre d'essai qu'un .*? ouvert avec DOTALL, la première position possible gagne).
+# En texte reconstruit (mise en page), une déclaration fait ~16 k caractères sur ~210 lignes et une
+# valeur peut suivre son libellé de 5 à 15 k caractères : la borne couvre le document entier.
+# Compter en lignes garde aussi la répétition sous la limite de RE2 (1000).
+LABEL_GAP_LINES = 300
+LABEL_GAP = r"(?:[^\n]*\n){0,%d}?[^\n]*?" % LABEL_GAP_LINES
+
+# Mode adaptive_order : l'ordre des patterns de chaque champ est recalculé d'après leurs
+# victoires tous les ADAPTIVE_RESORT_EVERY documents
+ADAPTIVE_RESORT_EVERY = 8
+
+# Résultats gardés en mémoire par extracteur (clé : empreinte du contenu du PDF)
+RESULT_CACHE_SIZE = 128
+
+# Textes de PDF gardés en mémoire par extracteur (clé : empreinte du contenu du fichier)
+TEXT_CACHE_SIZE = 64
+
+# En dessous de ce nombre de pages, l'extraction basique reste séquentielle
+# (le démarrage des processus coûterait plus que le gain)
+PARALLEL_PAGE_THRESHOLD = 8
+_PAGE_EXECUTOR = None
+# Texte (caractères) à partir duquel extract_all_fields répartit les sections entre threads
+# (section_workers > 1, moteur `regex` seulement) : en dessous, la répartition coûte plus qu'elle ne rapporte
+PARALLEL_SECTION_THRESHOLD = 50_000
+_SECTION_EXECUTOR = None
+# Pages confiées ensemble à un même processus par TextReconstructor en mode parallèle
+RECONSTRUCT_CHUNK_PAGES = 4
+# Séparateurs du texte reconstruit, construits une fois : chaque en-tête regroupe les trois
+# morceaux (séparés par des sauts de ligne) qu'il représentait dans le texte
+SEPARATOR = "=" * 80
+PAGE_HEADER = f"\n{SEPARATOR}\nPAGE {{}}\n{SEPARATOR}\n"
+TABLES_HEADER = f"\n{SEPARATOR}\n--- ZONES TABLEAUX PAGE {{}} ---\n{SEPARATOR}\n"
+TABLE_FOOTER = "\n" + "-" * 40
+
+# Taille (octets) à partir de laquelle l'extraction basique projette le PDF en mémoire (mmap)
+# au lieu de le lire en entier : seules les pages utiles (xref, flux des pages) sont chargées
+MMAP_THRESHOLD = 50 << 20
+
+# Tampon d'écriture des textes reconstruits (plusieurs Mo pour un long document) : quelques
+# gros appels write() au lieu d'un tous les 8 Kio
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Extracteur propre à chaque processus d'extract_batch (créé une fois par _init_batch_worker)
+_BATCH_EXTRACTOR = None
+
+
+def _required_literals(parsed, runs: List[str], current: List[str]) -> None:
+    """
+    Parcourt un pattern analysé par sre_parse et collecte dans `runs` les suites de
+    caractères littéraux présentes dans toute correspondance (en minuscules)
+    """
+    def close_run():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            char = chr(av)
+            if char not in _CASE_UNSAFE and (char.isascii() or not char.isalpha()):
+                current.append(char.lower())
+                continue
+            close_run()
+        elif op is sre_parse.SUBPATTERN:
+            # Groupe obligatoire : ses littéraux sont requis, mais la suite est interrompue
+            close_run()
+            _required_literals(av[-1], runs, current)
+            close_run()
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            close_run()
+            _required_literals(av[2], runs, current)
+            close_run()
+        else:
+            # Classes, alternatives, répétitions optionnelles, ancres : rien d'obligatoire
+            close_run()
+    close_run()
+
+
+def pattern_sentinel(pattern: str) -> Optional[str]:
+    """
+    Plus longue sous-chaîne (minuscules) nécessairement présente dans tout texte où le
+    pattern trouve une correspondance, ou None si aucune n'est assez longue
+    """
+    runs: List[str] = []
+    _required_literals(sre_parse.parse(pattern, PATTERN_FLAGS), runs, [])
+    longest = max(runs, key=len, default="")
+    return longest if len(longest) >= MIN_SENTINEL_LENGTH else None
+
+
+# Options qu'un groupe en ligne (?i-s:...) peut ajouter ou retirer
+_INLINE_FLAGS = (("i", re.IGNORECASE), ("m", re.MULTILINE), ("s", re.DOTALL))
+
+
+def scoped_pattern(regex: str, flags: int) -> str:
+    """
+    Pattern à compiler avec ses propres options `flags` exprimé pour PATTERN_FLAGS : les options
+    en plus ou en moins passent par un groupe en ligne, ex. "(?-s:...)" pour se passer de DOTALL.
+    Toute la chaîne d'analyse (sentinelles, Hyperscan, RE2, octets) reçoit ainsi une simple chaîne
+    """
+    if flags & ~(re.IGNORECASE | re.MULTILINE | re.DOTALL):
+        raise ValueError(f"Options non prises en charge pour un pattern : {flags!r}")
+    added = "".join(letter for letter, flag in _INLINE_FLAGS if flags & flag and not PATTERN_FLAGS & flag)
+    removed = "".join(letter for letter, flag in _INLINE_FLAGS if PATTERN_FLAGS & flag and not flags & flag)
+    if not added and not removed:
+        return regex
+    return f"(?{added}{'-' + removed if removed else ''}:{regex})"
+
+
+def pattern_source(entry: Union[str, Dict]) -> str:
+    """Chaîne compilée pour une entrée de "patterns" : chaîne telle quelle, ou {"regex", "flags"}"""
+    if isinstance(entry, str):
+        return entry
+    return scoped_pattern(entry["regex"], entry.get("flags", PATTERN_FLAGS))
+
+
+def _is_cased(code: int) -> bool:
+    char = chr(code)
+    return char.lower() != char or char.upper() != char
+
+
+def _pattern_items(parsed):
+    """Tous les éléments d'un pattern analysé : sous-patterns (groupes, répétitions, alternatives, lookarounds) et membres des classes compris"""
+    for op, av in parsed:
+        yield op, av
+        if op is sre_parse.IN:
+            yield from _pattern_items(av)
+            continue
+        for arg in av if isinstance(av, (tuple, list)) else (av,):
+            for sub in arg if isinstance(arg, list) else (arg,):
+                if isinstance(sub, sre_parse.SubPattern):
+                    yield from _pattern_items(sub)
+
+
+def minimal_flags(pattern: Union[str, bytes]) -> int:
+    """
+    PATTERN_FLAGS sans les options dont le pattern ne dépend pas, pour les mêmes correspondances :
+    IGNORECASE sans lettre (littéral ou plage d'une classe) ni renvoi à un groupe, DOTALL sans '.',
+    MULTILINE sans ^ ni $. \d, \s, \w et les autres catégories ne dépendent pas de la casse
+    """
+    items = list(_pattern_items(sre_parse.parse(pattern, PATTERN_FLAGS)))
+    flags = PATTERN_FLAGS
+    if not any(op is sre_parse.GROUPREF
+               or op in (sre_parse.LITERAL, sre_parse.NOT_LITERAL) and _is_cased(av)
+               or op is sre_parse.RANGE and any(map(_is_cased, range(av[0], av[1] + 1)))
+               for op, av in items):
+        flags &= ~re.IGNORECASE
+    if not any(op is sre_parse.ANY for op, _ in items):
+        flags &= ~re.DOTALL
+    if not any(op is sre_parse.AT and av in (sre_parse.AT_BEGINNING, sre_parse.AT_END) for op, av in items):
+        flags &= ~re.MULTILINE
+    return flags
+
+
+@lru_cache(maxsize=None)
+def compile_pattern(pattern: Union[str, bytes]) -> "re.Pattern":
+    """
+    Compile un pattern avec PATTERN_FLAGS, une seule fois par processus : les extracteurs
+    successifs et les configurations externes réutilisent l'objet compilé (le cache interne
+    de `re` est borné et refait un calcul de clé à chaque appel).
+    Chaque pattern ne reçoit que les options dont il dépend (voir minimal_flags) : un pattern sans
+    lettre (ex. montants, dates) évite la comparaison insensible à la casse
+    """
+    return re.compile(pattern, minimal_flags(pattern))
+
+
+def bytes_rules(pattern: str) -> Optional[int]:
+    """
+    Masque BYTES_WORD / BYTES_SPACE des règles Unicode dont dépend le pattern, ou None s'il
+    ne s'encode pas en Latin-1 (il reste alors toujours en str)
+    """
+    try:
+        pattern.encode("latin-1")
+    except UnicodeEncodeError:
+        return None
+    rules = 0
+    if _WORD_RULES.search(pattern) or any(not c.isascii() and c.isalpha() for c in pattern):
+        rules |= BYTES_WORD
+    if _SPACE_RULES.search(pattern):
+        rules |= BYTES_SPACE
+    return rules
+
+
+def encode_text(text: str):
+    """(octets Latin-1, masque des règles Unicode concernées) pour un texte, ou None s'il sort du Latin-1"""
+    try:
+        data = text.encode("latin-1")
+    except UnicodeEncodeError:
+        return None
+    rules = 0
+    if _NON_ASCII_WORD.search(text):
+        rules |= BYTES_WORD
+    if _UNICODE_SPACES.search(text):
+        rules |= BYTES_SPACE
+    if "\x0b" in text:
+        rules |= RE2_VTAB
+    return data, rules
+
+
+@lru_cache(maxsize=None)
+def compile_re2(pattern: bytes):
+    """Variante RE2 d'un pattern encodé en Latin-1, ou None si RE2 ne le prend pas en charge"""
+    options = re2.Options()
+    options.encoding = re2.Options.Encoding.LATIN1
+    options.max_mem = RE2_MAX_MEM
+    options.case_sensitive = False
+    options.log_errors = False
+    try:
+        # Équivalent en ligne de MULTILINE | DOTALL (IGNORECASE passe par les options)
+        return re2.compile(b"(?ms)" + pattern, options)
+    except re2.error:
+        return None
+
+
+@lru_cache(maxsize=None)
+def compile_regex(pattern: str):
+    """
+    Variante du module `regex` d'un pattern (syntaxe VERSION0), ou None s'il la refuse.
+    VERSION0 reprend la syntaxe de `re`, pas ses règles Unicode (\w, \s, casse hors ASCII) :
+    elle n'est utilisée que sur les textes où les deux coïncident (voir bytes_rules / encode_text).
+    Ses recherches acceptent concurrent=True, qui relâche le GIL pendant le parcours du texte.
+    """
+    try:
+        return regex.compile(pattern, regex.VERSION0 | regex.MULTILINE | regex.DOTALL | regex.IGNORECASE)
+    except regex.error:
+        return None
+
+
+class PatternTable(NamedTuple):
+    """Patterns compilés et données dérivées, en tableaux parallèles (même indice = même pattern)"""
+    compiled: list
+    sentinels: list
+    prefixes: list
+    bytes_rules: list
+    bytes_compiled: list
+    re2_rules: list
+    re2_compiled: list
+    skeletons: list
+    headers: list
+    anchors: list
+
+
+# Opérations qui rendent une correspondance dépendante du texte autour d'elle (ancres, lookarounds)
+# ou des numéros de groupe : un pattern qui en contient n'a pas de squelette
+_SKELETON_UNSAFE = (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT,
+                    sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS)
+
+
+def clean_value(value: Union[str, bytes, None]) -> Optional[str]:
+    """
+    Nettoyage d'une valeur capturée : suppression des '*', espaces (sauts de ligne compris) réduits
+    à un seul. replace puis split/join : plus rapide que deux re.sub sur ces chaînes courtes
+    """
+    if value is None:
+        return None  # Groupe qui n'a pas participé à la correspondance
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    return ' '.join(value.replace('*', '').split())
+
+
+def _skeleton_items(parsed) -> tuple:
+    items = []
+    for op, av in parsed:
+        if op is sre_parse.SUBPATTERN and not av[1] and not av[2]:
+            # Groupe sans option, capturant ou non : transparent pour la correspondance
+            items.extend(_skeleton_items(av[3]))
+        elif op in _SKELETON_UNSAFE:
+            raise ValueError(op)
+        else:
+            items.append((op, _skeleton_arg(av)))
+    return tuple(items)
+
+
+def _skeleton_arg(av):
+    if isinstance(av, sre_parse.SubPattern):
+        return _skeleton_items(av)
+    if isinstance(av, (tuple, list)):
+        return tuple(_skeleton_arg(a) for a in av)
+    return av
+
+
+@lru_cache(maxsize=None)
+def pattern_skeleton(pattern: str) -> Optional[tuple]:
+    """
+    Forme d'un pattern sans ses groupes : deux patterns de même squelette trouvent exactement les
+    mêmes correspondances (ex. vendeur.phone / vendeur.fax), seuls leurs groupes capturent autre
+    chose. Sans ancre ni lookaround, une correspondance ne dépend que des caractères qu'elle
+    couvre : l'autre pattern la retrouve par fullmatch sur le même intervalle. None sinon.
+    """
+    parsed = sre_parse.parse(pattern, PATTERN_FLAGS)
+    try:
+        return parsed.state.flags, _skeleton_items(parsed)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=256)
+def pattern_table(patterns: tuple) -> PatternTable:
+    """Construit (une fois par liste de patterns et par processus) les tableaux d'une liste de patterns"""
+    rules = [bytes_rules(p) for p in patterns]
+    first = {}
+    return PatternTable(
+        compiled=[compile_pattern(p) for p in patterns],
+        # Test de sous-chaîne préalable (beaucoup moins coûteux qu'une recherche regex)
+        sentinels=[pattern_sentinel(p) for p in patterns],
+        # Suite littérale proche du début : la recherche part peu avant sa première occurrence
+        prefixes=[pattern_prefix(p) for p in patterns],
+        # Variante octets de chaque pattern et règles Unicode dont elle dépend (voir encode_text)
+        bytes_rules=rules,
+        bytes_compiled=[compile_pattern(p.encode("latin-1")) if r is not None else None
+                        for p, r in zip(patterns, rules)],
+        re2_rules=[r | RE2_VTAB if r is not None and r & BYTES_SPACE else r for r in rules],
+        re2_compiled=[compile_re2(p.encode("latin-1")) if HAS_RE2 and r is not None else None
+                      for p, r in zip(patterns, rules)],
+        # Premier pattern de même squelette (voir pattern_skeleton) : une seule recherche pour tous
+        skeletons=[first.setdefault(skeleton, p) if skeleton is not None else None
+                   for p, skeleton in zip(patterns, map(pattern_skeleton, patterns))],
+        # En-tête suivi d'un saut de lignes libre : seule sa première occurrence est essayée
+        headers=[pattern_header(p) for p in patterns],
+        # Suites littérales proches du début (mode anchor_window : recherche autour de chacune)
+        anchors=[pattern_anchors(p) for p in patterns],
+    )
+
+
+def _start_anchors(parsed) -> int:
+    """Nombre d'ancres ^ (début de texte ou de ligne) dans un pattern analysé par sre_parse"""
+    count = 0
+    for op, av in parsed:
+        if op is sre_parse.AT:
+            count += av in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_LINE)
+        elif op is sre_parse.BRANCH:
+            count += sum(_start_anchors(branch) for branch in av[1])
+        elif op is sre_parse.SUBPATTERN:
+            count += _start_anchors(av[-1])
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            count += _start_anchors(av[2])
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            count += _start_anchors(av[1])
+    return count
+
+
+@lru_cache(maxsize=None)
+def hyperscan_expression(pattern: str) -> Optional[bytes]:
+    """
+    Expression du préfiltre Hyperscan pour un pattern, ou None si Hyperscan la refuserait
+    (ancre ^ ailleurs qu'en tête). Les bornes longues ({0,N}) deviennent des répétitions libres.
+    """
+    # Élargir le langage ne crée pas de faux négatif, et évite à la compilation de dérouler chaque borne
+    parsed = sre_parse.parse(pattern, PATTERN_FLAGS)
+    leading = 1 if len(parsed) and parsed[0][0] is sre_parse.AT else 0
+    if _start_anchors(parsed) > leading:
+        return None
+    return _HS_LONG_GAP.sub("*", pattern).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def hyperscan_accepts(expression: bytes) -> bool:
+    try:
+        hyperscan.Database().compile(expressions=[expression], ids=[0], elements=1, flags=[HS_FLAGS])
+    except hyperscan.error:
+        return False
+    return True
+
+
+def _record_match(pattern_id, start, end, flags, found):
+    """Rappel Hyperscan : note l'identifiant du pattern dans l'ensemble passé en contexte"""
+    found.add(pattern_id)
+
+
+@lru_cache(maxsize=None)
+def hyperscan_database(expressions: tuple) -> "hyperscan.Database":
+    """Base Hyperscan (identifiant = position dans `expressions`), compilée une fois par processus"""
+    db = hyperscan.Database()
+    db.compile(expressions=list(expressions), ids=list(range(len(expressions))),
+               elements=len(expressions), flags=[HS_FLAGS] * len(expressions))
+    return db
+
+
+def pattern_prefix(pattern: str) -> Optional[tuple]:
+    """
+    (suite littérale en minuscules, décalage maximal) : toute correspondance du pattern contient
+    cette suite à au plus `décalage` caractères de son début (0 : elle commence par elle), ou None.
+    La recherche peut alors démarrer `décalage` caractères avant sa première occurrence dans le
+    texte, même quand le pattern commence par une lettre à risque (I, S) ou une courte classe
+    """
+    return _literal_prefix(sre_parse.parse(pattern, PATTERN_FLAGS))
+
+
+def _literal_prefix(parsed) -> Optional[tuple]:
+    """pattern_prefix d'un pattern (ou d'une branche d'alternative) déjà analysé"""
+    offset = 0
+    run: List[str] = []
+    for op, av in _sequence_items(parsed):
+        if op is sre_parse.LITERAL:
+            char = chr(av)
+            if char not in _CASE_UNSAFE and (char.isascii() or not char.isalpha()):
+                run.append(char.lower())
+                continue
+        if len(run) >= 2:
+            break
+        # Suite trop courte : elle compte dans le décalage, comme l'élément qui l'interrompt
+        offset += len(run) + sre_parse.SubPattern(parsed.state, [(op, av)]).getwidth()[1]
+        run = []
+        if offset > PREFIX_MAX_OFFSET:
+            return None
+    return ("".join(run), offset) if len(run) >= 2 else None
+
+
+def pattern_anchors(pattern: str) -> Optional[tuple]:
+    """
+    ((suite littérale, décalage maximal), ...) : toute correspondance du pattern contient l'une de
+    ces suites (minuscules) à au plus `décalage` caractères de son début. La suite de pattern_prefix,
+    ou une par branche quand le pattern commence par une alternative, ex. (?:Phone|Téléphone) ;
+    None si une branche n'en a pas
+    """
+    prefix = pattern_prefix(pattern)
+    if prefix is not None:
+        return (prefix,)
+    items = list(_sequence_items(sre_parse.parse(pattern, PATTERN_FLAGS)))
+    if not items or items[0][0] is not sre_parse.BRANCH:
+        return None
+    anchors = {}
+    for branch in items[0][1][1]:
+        found = _literal_prefix(branch)
+        if found is None:
+            return None
+        literal, offset = found
+        anchors[literal] = max(offset, anchors.get(literal, 0))
+    return tuple(anchors.items())
+
+
+def _sequence_items(parsed):
+    """Éléments successifs d'un pattern analysé, groupes dépliés (ils ne changent pas les positions)"""
+    for op, av in parsed:
+        if op is sre_parse.SUBPATTERN:
+            # Groupe capturant, ou options en ligne d'un pattern à options propres
+            yield from _sequence_items(av[-1])
+        else:
+            yield op, av
+
+
+# Saut de lignes et écart libre qui suivent un en-tête : (?:[^\n]*\n){1,N} ou (?:[\s\S]*?\n){1,N},
+# puis .*? (ou .*) avec DOTALL
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_ANY_CHAR = ([(sre_parse.NOT_LITERAL, 10)], [(sre_parse.ANY, None)],
+             [(sre_parse.IN, [(sre_parse.CATEGORY, sre_parse.CATEGORY_SPACE),
+                              (sre_parse.CATEGORY, sre_parse.CATEGORY_NOT_SPACE)])])
+
+
+def _any_run(item) -> bool:
+    """Répétition libre (0 à l'infini) d'un caractère quelconque (saut de ligne exclu ou non)"""
+    op, av = item
+    return op in _REPEATS and av[0] == 0 and av[1] == sre_parse.MAXREPEAT and av[2].data in _ANY_CHAR
+
+
+def pattern_header(pattern: str):
+    """
+    En-tête compilé d'un pattern de la forme EN-TÊTE(?:[^\n]*\n){1,N}.*?SUITE (DOTALL), ou None.
+    Après le premier saut de ligne qui suit un en-tête, l'écart libre atteint n'importe quelle
+    position : si la suite n'est pas trouvée après la première occurrence de l'en-tête, elle ne
+    l'est après aucune autre. Il suffit donc d'essayer le pattern à cette seule position, au lieu
+    de relire la fin du texte depuis chaque occurrence (coût quadratique quand la suite manque).
+    """
+    parsed = sre_parse.parse(pattern, PATTERN_FLAGS)
+    if not parsed.state.flags & re.DOTALL:
+        return None
+    items = parsed.data
+    for j in range(1, len(items) - 1):
+        op, av = items[j]
+        if (op in _REPEATS and av[0] >= 1 and len(av[2]) == 2 and _any_run(av[2][0])
+                and av[2][1] == (sre_parse.LITERAL, 10) and _any_run(items[j + 1])):
+            return sre_compile.compile(sre_parse.SubPattern(parsed.state, items[:j]), parsed.state.flags)
+    return None
+
+
+def _page_executor(max_workers: int) -> ProcessPoolExecutor:
+    """Pool de processus partagé pour l'extraction page par page, créé à la première utilisation"""
+    global _PAGE_EXECUTOR
+    if _PAGE_EXECUTOR is None:
+        _PAGE_EXECUTOR = ProcessPoolExecutor(max_workers=max_workers)
+    return _PAGE_EXECUTOR
+
+
+def _section_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Pool de threads partagé pour l'extraction section par section, créé à la première utilisation"""
+    global _SECTION_EXECUTOR
+    if _SECTION_EXECUTOR is None:
+        _SECTION_EXECUTOR = ThreadPoolExecutor(max_workers=max_workers)
+    return _SECTION_EXECUTOR
+
+
+def read_pdf_bytes(pdf_path: Union[str, Path]) -> bytes:
+    """
+    Contenu complet d'un PDF en une seule lecture (fichier non tamponné : tampon dimensionné d'après
+    sa taille), à la place des milliers de petites lectures que font les parseurs sur un fichier ouvert
+    """
+    with open(pdf_path, 'rb', buffering=0) as file:
+        return file.readall()
+
+
+def file_digest(pdf_path: Union[str, Path]) -> str:
+    """
+    Empreinte du contenu d'un fichier, calculée à chaque appel : un fichier réécrit sans que
+    sa date ni sa taille changent n'a pas la même clé. Un gros fichier est projeté en mémoire
+    (voir MMAP_THRESHOLD) plutôt que lu en entier.
+    """
+    with open(pdf_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size >= MMAP_THRESHOLD:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return content_hash(mapped).hexdigest()
+        return content_hash(file.read()).hexdigest()
+
+
+def _extract_page_text(pdf_bytes: bytes, page_index: int) -> str:
+    """
+    Extrait le texte d'une page (exécuté dans un processus du pool). Les objets PyPDF2 ne
+    sont pas sérialisables : chaque processus rouvre le document depuis ses octets.
+    """
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return reader.pages[page_index].extract_text() or ""
+
+
+def _pdfium_page_texts(source) -> Iterable[str]:
+    """
+    Texte de chaque page par pypdfium2 (octets, chemin ou objet fichier), produit page par page :
+    les pages restantes ne sont pas lues si l'appelant s'arrête en route
+    """
+    pdf = pdfium.PdfDocument(source)
+    try:
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                yield textpage.get_text_range().replace("\r\n", "\n")
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+
+
+def _camelot_tables(pdf_path: str, pages: str, layout: tuple = NO_TABLE_LAYOUT) -> List[tuple]:
+    """
+    (numéro de page, tableau) pour chaque tableau des pages demandées ("1" ou "1,2,5"), lus
+    par Camelot en un seul passage sur le fichier ; lignes entièrement vides retirées
+    `layout` : (zones, séparateurs de colonnes) connus d'avance, voir calibrate_table_areas
+    """
+    _load_advanced()
+    areas, columns = layout
+    options = {}
+    if areas:
+        options['table_areas'] = list(areas)
+    if columns:
+        options['columns'] = list(columns)
+    tables = camelot.read_pdf(
+        pdf_path,
+        pages=pages,
+        flavor='stream',
+        row_tol=10,
+        edge_tol=500,
+        strip_text='\n',
+        suppress_stdout=True,
+        **options
+    )
+    frames = []
+    for table in tables:
+        # Cellules toujours en chaînes : un seul masque suffit à retirer les lignes vides
+        df = table.df
+        frames.append((int(table.page), df[(df.to_numpy() != '').any(axis=1)]))
+        # Seul le DataFrame sert : les objets de mise en page (caractères, cellules, image de la
+        # page) sont libérés sans attendre la fin du document
+        for name in _CAMELOT_PAGE_ATTRS:
+            if hasattr(table, name):
+                setattr(table, name, None)
+    del tables
+    return frames
+
+
+def _table_markdown(df) -> str:
+    return df.to_markdown(index=False, tablefmt="pipe") if not df.empty else "[Tableau vide]"
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _page_table_texts(pdf_path: str, mtime_ns: int, size: int, page_number: int,
+                      layout: tuple = NO_TABLE_LAYOUT) -> tuple:
+    """
+    Texte Markdown des tableaux d'une page, gardé en cache : une page déjà lue n'est ni
+    repassée à Camelot ni reconvertie (la date et la taille du fichier font partie de la clé)
+    Une erreur de Camelot est propagée : un échec n'est pas gardé en cache, l'appel suivant relit
+    la page
+    """
+    return tuple(_table_markdown(df) for _, df in _camelot_tables(pdf_path, str(page_number), layout))
+
+
+def _page_table_texts_or_none(pdf_path: str, mtime_ns: int, size: int, page_number: int,
+                              layout: tuple = NO_TABLE_LAYOUT) -> Optional[tuple]:
+    """_page_table_texts, ou None si Camelot a échoué sur la page (tableaux non lus)"""
+    try:
+        return _page_table_texts(pdf_path, mtime_ns, size, page_number, layout)
+    except Exception:
+        return None  # Silencieux pour ne pas bloquer l'extraction
+
+
+@lru_cache(maxsize=TABLE_CACHE_SIZE)
+def _document_table_texts(pdf_path: str, mtime_ns: int, size: int, pages: tuple,
+                          layout: tuple = NO_TABLE_LAYOUT) -> Dict[int, tuple]:
+    """
+    Comme _page_table_texts pour plusieurs pages à la fois, en un seul appel à Camelot
+    (le PDF n'est ouvert et analysé qu'une fois au lieu d'une fois par page) ; comme elle,
+    propage les erreurs de Camelot pour ne pas garder un échec en cache
+    """
+    grouped = defaultdict(list)
+    for page_number, df in _camelot_tables(pdf_path, ",".join(map(str, pages)), layout):
+        grouped[page_number].append(_table_markdown(df))
+    return {page_number: tuple(grouped.get(page_number, ())) for page_number in pages}
+
+
+def _tables_by_page(pdf_path: str, mtime_ns: int, size: int, pages: Iterable[int],
+                    layouts: Dict[int, tuple]) -> Dict[int, tuple]:
+    """
+    Texte des tableaux de chaque page : un appel à Camelot par disposition distincte
+    (un seul sans calibrage, les zones connues ne valant que pour toutes les pages d'un appel)
+    None pour une page dont les tableaux n'ont pu être lus
+    """
+    groups = defaultdict(list)
+    for page_number in dict.fromkeys(pages):
+        groups[layouts.get(page_number, NO_TABLE_LAYOUT)].append(page_number)
+    tables = {}
+    for layout, group in groups.items():
+        try:
+            tables.update(_document_table_texts(pdf_path, mtime_ns, size, tuple(group), layout))
+        except Exception:
+            # Un échec ne doit pas priver les autres pages de leurs tableaux : reprise page par page
+            for page_number in group:
+                tables[page_number] = _page_table_texts_or_none(pdf_path, mtime_ns, size, page_number, layout)
+    return tables
+
+
+def calibrate_table_areas(pdf_path: Union[str, Path], pages: str = "1"):
+    """
+    Relève sur un PDF de référence les zones et colonnes des tableaux trouvés par Camelot,
+    au format attendu par TextReconstructor.TABLE_AREAS / TABLE_COLUMNS :
+        areas, columns = calibrate_table_areas("modele.pdf", pages="1,2")
+        TextReconstructor.TABLE_AREAS, TextReconstructor.TABLE_COLUMNS = areas, columns
+    Les coordonnées ne valent que pour des documents de même mise en page.
+    """
+    _load_advanced()
+    tables = camelot.read_pdf(str(pdf_path), pages=pages, flavor='stream', row_tol=10,
+                              edge_tol=500, strip_text='\n', suppress_stdout=True)
+    areas, columns = defaultdict(list), defaultdict(list)
+    for table in tables:
+        # _bbox : (x gauche, y bas, x droite, y haut) ; Camelot attend "x1,y1,x2,y2" (haut gauche, bas droite)
+        x0, y0, x1, y1 = table._bbox
+        areas[int(table.page)].append(f"{x0},{y1},{x1},{y0}")
+        columns[int(table.page)].append(",".join(str(right) for _, right in table.cols[:-1]))
+    return dict(areas), dict(columns)
+
+
+def _layout_text(page) -> str:
+    return page.extract_text(layout=True, x_tolerance=3, y_tolerance=3)
+
+
+@contextmanager
+def _page_text_source(pdf_path: str, engine: str):
+    """
+    Ouvre le PDF pour l'extraction du texte des pages : (nombre de pages, fonction numéro -> texte)
+    pdfplumber reproduit la mise en page (colonnes alignées par des espaces) ; PyMuPDF, bien plus
+    rapide, rend le texte dans l'ordre de lecture mais sans cet alignement.
+    Le fichier est lu en une fois : les parseurs travaillent ensuite sur un tampon en mémoire.
+    """
+    data = read_pdf_bytes(pdf_path)
+    if engine == "pymupdf":
+        doc = pymupdf.open(stream=data, filetype="pdf")
+        try:
+            yield doc.page_count, lambda page_num: doc[page_num - 1].get_text("text", sort=True)
+        finally:
+            doc.close()
+    else:
+        _load_advanced()
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            yield len(pdf.pages), lambda page_num: _layout_text(pdf.pages[page_num - 1])
+
+
+def _reconstruct_pages(pdf_path: str, mtime_ns: int, size: int, pages: tuple, engine: str,
+                       layouts: Dict[int, tuple]) -> List[tuple]:
+    """
+    (page, texte, tableaux) pour une tranche de pages (exécuté dans un processus du pool) :
+    le PDF est ouvert une fois par tranche pour le texte et une fois par Camelot
+    """
+    tables_by_page = _tables_by_page(pdf_path, mtime_ns, size, pages, layouts)
+    with _page_text_source(pdf_path, engine) as (_, page_text):
+        return [(page_num, page_text(page_num), tables_by_page.get(page_num, ()))
+                for page_num in pages]
+
+
+def _table_entries(texts: Iterable[str]) -> List[Dict]:
+    return [{'type': 'table_formatted', 'text': table_text, 'table_number': i + 1}
+            for i, table_text in enumerate(texts)]
 
 
 class TextReconstructor:
     """Reconstruit le texte PDF en préservant la structure et les tableaux"""
     
-    def __init__(self, pdf_path: Union[str, Path], output_dir: Optional[str] = None):
+    # Moteurs du texte des pages (les tableaux restent lus par Camelot)
+    ENGINES = ("pdfplumber", "pymupdf")
+
+    # Zones des tableaux par page ({page: ["x1,y1,x2,y2", ...]}) et séparateurs de colonnes
+    # (une chaîne "x1,x2,..." par zone), relevés par calibrate_table_areas sur un document de
+    # référence : Camelot ne cherche plus les tableaux sur toute la page. None = page entière
+    TABLE_AREAS: Optional[Dict[int, List[str]]] = None
+    TABLE_COLUMNS: Optional[Dict[int, List[str]]] = None
+
+    def __init__(self, pdf_path: Union[str, Path], output_dir: Optional[str] = None,
+                 parallel: bool = False, max_workers: Optional[int] = None, engine: str = "pdfplumber",
+                 cache_dir: Optional[Union[str, Path]] = None):
         if not ADVANCED_EXTRACTION:
             raise ImportError("pdfplumber et camelot requis pour TextReconstructor")
+        _load_advanced()
+        if engine not in self.ENGINES:
+            raise ValueError(f"Moteur de reconstruction inconnu : {engine}")
+        if engine == "pymupdf" and not HAS_PYMUPDF:
+            raise ImportError("PyMuPDF requis pour le moteur 'pymupdf'")
+        self.engine = engine
             
         self.pdf_path = Path(pdf_path).resolve()
         if not self.pdf_path.exists():
@@ -36,88 +892,194 @@ class TextReconstructor:
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         self.reconstructed_text = ""
+        # Fichier du texte reconstruit quand reconstruct(stream_to=...) l'a écrit au fil des pages
+        self.stream_path = None
         self.tables_data = []
+        # Pages dont les tableaux n'ont pu être lus (texte incomplet, à ne pas garder en cache)
+        self.tables_failed = []
+        # Pages réparties entre processus (longs documents uniquement, voir PARALLEL_PAGE_THRESHOLD) ;
+        # désactivé par défaut pour garder un déroulement séquentiel facile à déboguer
+        self.parallel = parallel
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # Textes reconstruits gardés sur disque d'un appel (et d'un processus) à l'autre, par
+        # empreinte du contenu du PDF (voir _cache_file) ; None = pas de cache disque
+        self.cache_dir = Path(cache_dir).resolve() if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
     
-    def _extract_tables(self, page_number: int = 1) -> List[Dict]:
-        """Extrait les tableaux avec Camelot"""
+    def _extract_tables(self, page_number: int = 1, keep_df: bool = False) -> List[Dict]:
+        """
+        Extrait les tableaux avec Camelot
+        Seul le texte Markdown est conservé (et mis en cache par page) ; `keep_df=True` ajoute
+        le DataFrame de chaque tableau ('raw_df') et relit la page
+        """
+        if not keep_df:
+            stat = self.pdf_path.stat()
+            texts = _page_table_texts_or_none(str(self.pdf_path), stat.st_mtime_ns, stat.st_size, page_number,
+                                              self._table_layouts([page_number]).get(page_number, NO_TABLE_LAYOUT))
+            return _table_entries(texts or ())
+
         tables_found = []
         try:
-            tables = camelot.read_pdf(
-                str(self.pdf_path), 
-                pages=str(page_number), 
-                flavor='stream',
-                row_tol=10,
-                edge_tol=500,
-                strip_text='\n'
-            )
-            
-            for i, table in enumerate(tables):
-                df = table.df.replace('', pd.NA).dropna(how='all').fillna('')
-                
-                if not df.empty:
-                    table_text = df.to_markdown(index=False, tablefmt="pipe")
-                else:
-                    table_text = "[Tableau vide]"
-                
+            layout = self._table_layouts([page_number]).get(page_number, NO_TABLE_LAYOUT)
+            for i, (_, df) in enumerate(_camelot_tables(str(self.pdf_path), str(page_number), layout)):
                 tables_found.append({
                     'type': 'table_formatted',
-                    'text': table_text,
+                    'text': _table_markdown(df),
                     'raw_df': df,
                     'table_number': i + 1
                 })
-                
         except Exception as e:
             pass  # Silencieux pour ne pas bloquer l'extraction
             
         return tables_found
     
-    def reconstruct(self, page_numbers: Optional[List[int]] = None) -> str:
-        """Reconstruit le texte complet (toutes les pages ou sélectionnées)"""
-        with pdfplumber.open(self.pdf_path) as pdf:
-            total_pages = len(pdf.pages)
+    def _table_layouts(self, pages: Iterable[int]) -> Dict[int, tuple]:
+        """Disposition calibrée (zones, colonnes) des pages qui en ont une"""
+        if not self.TABLE_AREAS:
+            return {}
+        columns = self.TABLE_COLUMNS or {}
+        return {page: (tuple(self.TABLE_AREAS[page]), tuple(columns[page]) if page in columns else None)
+                for page in pages if page in self.TABLE_AREAS}
+
+    def _reconstruct_parallel(self, pages: List[int], stat: os.stat_result) -> List[tuple]:
+        """(page, texte, tableaux) de chaque page, calculés par tranches dans le pool de processus"""
+        chunks = [tuple(pages[i:i + RECONSTRUCT_CHUNK_PAGES])
+                  for i in range(0, len(pages), RECONSTRUCT_CHUNK_PAGES)]
+        executor = _page_executor(self.max_workers)
+        results = executor.map(_reconstruct_pages, repeat(str(self.pdf_path)), repeat(stat.st_mtime_ns),
+                               repeat(stat.st_size), chunks, repeat(self.engine),
+                               map(self._table_layouts, chunks))
+        return [page for chunk in results for page in chunk]
+
+    def reconstruct(self, page_numbers: Optional[List[int]] = None,
+                    stream_to: Optional[Union[str, Path]] = None) -> Union[str, Path]:
+        """
+        Reconstruit le texte complet (toutes les pages ou sélectionnées)
+        Avec `stream_to`, le texte est écrit dans ce fichier au fil des pages (mémoire constante
+        quel que soit le nombre de pages) et c'est le chemin du fichier qui est renvoyé
+        """
+        stat = self.pdf_path.stat()
+        cache_file = self._cache_file(page_numbers)
+        if cache_file is not None and cache_file.exists():
+            return self._load_cached(cache_file, stream_to)
+
+        first_table = len(self.tables_data)
+        result = self._reconstruct(page_numbers, stream_to, stat)
+        if cache_file is not None and not self.tables_failed:
+            self._store_cached(cache_file, self.tables_data[first_table:])
+        return result
+
+    def _cache_file(self, page_numbers: Optional[List[int]]) -> Optional[Path]:
+        """Fichier du cache disque pour ce contenu, ces pages, ce moteur et ces zones de tableaux"""
+        if self.cache_dir is None:
+            return None
+        digest = file_digest(self.pdf_path)
+        options = repr((tuple(page_numbers) if page_numbers else None, self.engine,
+                        self.TABLE_AREAS, self.TABLE_COLUMNS))
+        return self.cache_dir / f"{digest[:32]}-{hashlib.sha1(options.encode()).hexdigest()[:16]}.txt"
+
+    def _load_cached(self, cache_file: Path, stream_to: Optional[Union[str, Path]]) -> Union[str, Path]:
+        with open(cache_file.with_suffix(".tables.json"), encoding="utf-8") as f:
+            self.tables_data.extend(json.load(f))
+        if stream_to is None:
+            self.stream_path = None
+            self.reconstructed_text = cache_file.read_text(encoding="utf-8")
+            return self.reconstructed_text
+        self.stream_path = Path(stream_to).resolve()
+        self.reconstructed_text = ""
+        shutil.copyfile(cache_file, self.stream_path)
+        return self.stream_path
+
+    def _store_cached(self, cache_file: Path, tables: List[Dict]):
+        """
+        Écrit le texte et les tableaux dans le cache (fichier temporaire puis remplacement atomique) ;
+        le texte en dernier : sa présence signifie que l'entrée est complète
+        """
+        suffix = f".tmp.{os.getpid()}.{threading.get_ident()}"
+        tables_file = cache_file.with_suffix(".tables.json")
+        tmp_path = Path(f"{tables_file}{suffix}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(tables, f, ensure_ascii=False)
+        os.replace(tmp_path, tables_file)
+
+        tmp_path = Path(f"{cache_file}{suffix}")
+        if self.stream_path is not None:
+            shutil.copyfile(self.stream_path, tmp_path)
+        else:
+            with open(tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+                f.write(self.reconstructed_text)
+        os.replace(tmp_path, cache_file)
+
+    def _reconstruct(self, page_numbers: Optional[List[int]], stream_to: Optional[Union[str, Path]],
+                     stat: os.stat_result) -> Union[str, Path]:
+        with _page_text_source(str(self.pdf_path), self.engine) as (total_pages, page_text_of):
             pages_to_process = page_numbers if page_numbers else list(range(1, total_pages + 1))
             
-            reconstructed_parts = []
-            
-            for page_num in pages_to_process:
-                if page_num > total_pages:
-                    continue
-                
+            pages_to_process = [p for p in pages_to_process if p <= total_pages]
+
+            if (self.parallel and self.max_workers > 1
+                    and len(pages_to_process) >= PARALLEL_PAGE_THRESHOLD):
+                pages = self._reconstruct_parallel(pages_to_process, stat)
+            else:
+                # Tableaux de toutes les pages lus d'avance (un seul appel à Camelot par disposition)
+                tables_by_page = _tables_by_page(str(self.pdf_path), stat.st_mtime_ns, stat.st_size,
+                                                 pages_to_process, self._table_layouts(pages_to_process))
                 # Extraction texte de base
-                page = pdf.pages[page_num - 1]
-                page_text = page.extract_text(layout=True, x_tolerance=3, y_tolerance=3)
-                
-                if page_text:
-                    reconstructed_parts.append(f"\n{'='*80}")
-                    reconstructed_parts.append(f"PAGE {page_num}")
-                    reconstructed_parts.append(f"{'='*80}\n")
-                    reconstructed_parts.append(page_text)
-                
-                # Extraction tableaux
-                tables = self._extract_tables(page_num)
-                if tables:
-                    reconstructed_parts.append("\n" + "="*80)
-                    reconstructed_parts.append(f"--- ZONES TABLEAUX PAGE {page_num} ---")
-                    reconstructed_parts.append("="*80 + "\n")
-                    
-                    for tbl in tables:
-                        reconstructed_parts.append(f"\n[Tableau #{tbl['table_number']}]\n")
-                        reconstructed_parts.append(tbl['text'])
-                        reconstructed_parts.append("\n" + "-"*40)
-                        self.tables_data.append(tbl)
+                pages = ((page_num, page_text_of(page_num), tables_by_page.get(page_num, ()))
+                         for page_num in pages_to_process)
+
+            if stream_to is None:
+                self.stream_path = None
+                self.reconstructed_text = "\n".join(self._text_parts(pages))
+                return self.reconstructed_text
+
+            self.stream_path = Path(stream_to).resolve()
+            self.reconstructed_text = ""
+            with open(self.stream_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
+                for i, part in enumerate(self._text_parts(pages)):
+                    if i:
+                        f.write("\n")
+                    f.write(part)
+            return self.stream_path
+
+    def _text_parts(self, pages: Iterable[tuple]):
+        """Morceaux du texte reconstruit (à joindre par des sauts de ligne), page après page"""
+        for page_num, page_text, table_texts in pages:
+            if table_texts is None:
+                self.tables_failed.append(page_num)
+                table_texts = ()
+            if page_text:
+                yield PAGE_HEADER.format(page_num)
+                yield page_text
             
-            self.reconstructed_text = "\n".join(reconstructed_parts)
-            return self.reconstructed_text
+            # Extraction tableaux
+            tables = _table_entries(table_texts)
+            if tables:
+                yield TABLES_HEADER.format(page_num)
+                
+                for tbl in tables:
+                    yield f"\n[Tableau #{tbl['table_number']}]\n"
+                    yield tbl['text']
+                    yield TABLE_FOOTER
+                    self.tables_data.append(tbl)
     
     def save_text(self, output_path: Optional[str] = None) -> Path:
-        """Sauvegarde le texte reconstruit"""
+        """Sauvegarde le texte reconstruit (copie du fichier si reconstruct a écrit au fil de l'eau)"""
         if not output_path:
+            if self.stream_path is not None:
+                return self.stream_path
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = self.output_dir / f"texte_reconstruit_{timestamp}.txt"
         
         output_path = Path(output_path).resolve()
+
+        if self.stream_path is not None:
+            if output_path != self.stream_path:
+                shutil.copyfile(self.stream_path, output_path)
+            return output_path
         
-        with open(output_path, "w", encoding="utf-8") as f:
+        with open(output_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f:
             f.write(self.reconstructed_text)
         
         return output_path
@@ -129,13 +1091,88 @@ class ImportDeclarationExtractor:
     Compatible avec Flask API et DataManager
     """
     
-    def __init__(self, use_advanced_extraction: bool = True):
+    # Moteurs d'extraction basique : PyPDF2 conserve l'espacement des colonnes dont dépendent
+    # plusieurs patterns (\s{2,}) ; PDFium est bien plus rapide mais le réduit à un espace.
+    # Sans PyPDF2 installé, PDFium est utilisé dans tous les cas.
+    TEXT_ENGINES = ("pypdf2", "pdfium")
+
+    # Moteurs regex des patterns que RE2 ne prend pas en charge : `re`, ou `regex` (légèrement plus
+    # lent sur un seul thread, mais il relâche le GIL : les threads gunicorn extraient en parallèle)
+    PATTERN_ENGINES = ("re", "regex")
+
+    # En-têtes (minuscules) qui ouvrent chaque section dans le texte, pour use_regions=True.
+    # Les sections absentes d'ici, ou dont l'en-tête manque, sont cherchées dans tout le texte.
+    SECTION_ANCHORS = {
+        "importateur": "importateur",
+        "vendeur": "vendeur (nom",
+        "commissionnaire": "commissionaire",
+        "dedouanement": "lieu de dédouanement",
+        "pays": "pays de provenance",
+        "transport": "transport mode",
+        "valeurs_financieres": "devise / currency",
+        "marchandises": "description des marchandises",
+        "taxe_inspection": "chéque",
+        "assurance": "insurance",
+    }
+
+    def __init__(self, use_advanced_extraction: bool = True, text_engine: str = "pypdf2",
+                 page_workers: Optional[int] = None, cache_path: Optional[str] = None,
+                 layout_engine: str = "pdfplumber", use_regions: bool = False,
+                 pattern_engine: str = "re", text_cache_dir: Optional[str] = None,
+                 adaptive_order: bool = False, section_workers: int = 1,
+                 anchor_window: Optional[int] = None):
+        if text_engine not in self.TEXT_ENGINES:
+            raise ValueError(f"Moteur d'extraction inconnu : {text_engine}")
+        if layout_engine not in TextReconstructor.ENGINES:
+            raise ValueError(f"Moteur de reconstruction inconnu : {layout_engine}")
+        if pattern_engine not in self.PATTERN_ENGINES:
+            raise ValueError(f"Moteur regex inconnu : {pattern_engine}")
+        self.text_engine = text_engine if HAS_PYPDF2 else "pdfium"
+        # Texte des pages en extraction avancée (voir TextReconstructor.ENGINES)
+        self.layout_engine = layout_engine
+        # Processus utilisés pour extraire les pages des longs PDF (1 = toujours séquentiel)
+        self.page_workers = page_workers or os.cpu_count() or 1
+        # Cache des résultats par contenu : LRU en mémoire + base SQLite optionnelle (partageable
+        # entre processus), voir extract_pdf_data
+        self.cache_path = cache_path
+        self._result_cache = OrderedDict()
+        # Textes déjà extraits par extract_from_pdf (LRU, voir TEXT_CACHE_SIZE)
+        self._text_cache = OrderedDict()
+        # Cache disque des textes reconstruits (voir TextReconstructor.cache_dir)
+        self.text_cache_dir = text_cache_dir
+        self._cache_db = None
+        self._cache_db_pid = None
+        # Espace de travail Hyperscan alloué une fois par thread (il ne se partage pas entre scans simultanés)
+        self._hs_local = threading.local()
         self.data = {}
         self.extracted_text = ""
         self.use_advanced = use_advanced_extraction and ADVANCED_EXTRACTION
         self.reconstructor = None
+        # Recherche de chaque section dans sa seule portion de texte (voir _split_regions)
+        self.use_regions = use_regions
+        # Patterns essayés d'abord dans l'ordre de leurs victoires passées (lots d'un même modèle de
+        # document) : plus rapide, mais le premier pattern qui correspond n'est plus forcément celui
+        # de plus haute priorité dans la structure
+        self.adaptive_order = adaptive_order
+        self._pattern_wins = {}
+        self._pattern_order = {}
+        self._documents_seen = 0
+        self.pattern_engine = pattern_engine if HAS_REGEX else "re"
+        # Threads entre lesquels les sections d'un long texte sont réparties : seul le moteur `regex`
+        # relâche le GIL pendant une recherche (`re` le garde, les threads n'y gagneraient rien)
+        self.section_workers = section_workers
+        # Recherche bornée autour des suites littérales de tête de chaque pattern (voir
+        # _anchor_windows) : plus rapide sur les longs textes, mais une valeur située à plus de
+        # `anchor_window` caractères (jusqu'à la fin de ligne) de sa suite n'est plus trouvée
+        self.anchor_window = anchor_window
+        # Dernier texte analysé par extract_all_fields et ses résultats (appels répétés sur le même texte)
+        self._last_fields = None
         
         # Structure basée sur le format réel du document
+        # Les écarts entre deux libellés sont bornés (LABEL_GAP) plutôt qu'ouverts (.*? avec DOTALL) :
+        # un libellé absent ne fait plus parcourir tout le reste d'un texte de plusieurs documents
+        # Un pattern s'écrit en chaîne (options PATTERN_FLAGS) ou {"regex": ..., "flags": ...} pour
+        # des options propres (ex. sans re.DOTALL), voir pattern_source
         self.structure = {
             "declaration": {
     "di_number": {
@@ -145,7 +1182,7 @@ class ImportDeclarationExtractor:
             # Gère les points optionnels dans D.I, les espaces et un éventuel saut de ligne après ":"
             r"D\.I\.?\s*N°\s*:\s*\n?\s*([A-Z]{3}-\d{5}-\d{2})",
             # Variante pour "DECLARATION N°" si cette forme apparaît
-            r"DECLARATION.*?N°\s*:\s*\n?\s*([A-Z]{3}-\d{5}-\d{2})",
+            r"DECLARATION" + LABEL_GAP + r"N°\s*:\s*\n?\s*([A-Z]{3}-\d{5}-\d{2})",
             # Pattern plus tolérant pour le numéro, au cas où il y aurait moins de 5 chiffres ou plus
             r"D\.?I\.?\s*N°\s*:\s*\n?([A-Z]{3}-\d+-\d+)"
         ]
@@ -237,7 +1274,7 @@ class ImportDeclarationExtractor:
                 "code_statistical": {
                     "label": "Code/Statistical number",
                     "patterns": [
-                        r"(?:Code|Statistical|Number)[^\n]*number[^\n]*\n\s*([A-Z]\d{11,13}[A-Z])(?:\s+\d{9,}|[^\n]*)",
+                        r"(?:Code|Statistical|Number)[^\n]*number[^\n]*\n\s*([A-Z]\d{11,13}[A-Z])",
                         r"([A-Z]\d{11,13}[A-Z])\s+(?:237\d{9})"
                     ]
                 },
@@ -330,8 +1367,10 @@ class ImportDeclarationExtractor:
                     "label": "Lieu de dédouanement / Custom clearing office",
                     "patterns": [
                         r"KRIBI\s+PORT",
-                        r"Custom\s*clearing\s*office\s*\n\s*([A-Z][A-Z\s]+?)(?=\n|Pays)",
-                        r"dédouanement.*?office\s*\n?\s*([A-Z\s]+?)(?=\n|Pays)",
+                        # Fin de valeur consommée ((?:\n|Pays) plutôt que le lookahead (?=\n|Pays)) : même
+                        # groupe capturé, et le pattern reste dans RE2 (temps linéaire)
+                        r"Custom\s*clearing\s*office\s*\n\s*([A-Z][A-Z\s]+?)(?:\n|Pays)",
+                        r"dédouanement" + LABEL_GAP + r"office\s*\n?\s*([A-Z\s]+?)(?:\n|Pays)",
                     ]
                 },
             },
@@ -347,7 +1386,7 @@ class ImportDeclarationExtractor:
         # 3. Va à la ligne suivante (\n)
         # 4. Ignore la première colonne (le Port) qui est en majuscules suivie d'un grand espace (.*?\s{2,})
         # 5. Capture le Code (2 lettres) + le Nom du pays ([A-Z]{2}\s+[a-zA-Z\s]+)
-        r"(?:Pays de provenance|Country)[\s\S]*?of Shipment[^\n]*\n(?:.*?\s{2,}|^\s*)([A-Z]{2}\s+[a-zA-Z\s]+)(?:\s{2,}|\n|$)",
+        r"(?:Pays de provenance|Country)" + LABEL_GAP + r"of Shipment[^\n]*\n(?:.*?\s{2,}|^\s*)([A-Z]{2}\s+[a-zA-Z\s]+)(?:\s{2,}|\n|$)",
 
         # Pattern 2 (Alternatif) : Si la ligne "of Shipment" est mal lue
         # Cherche la ligne contenant "Pays de provenance", saute une ligne, 
@@ -365,7 +1404,7 @@ class ImportDeclarationExtractor:
         # 3. Va à la ligne suivante (\n)
         # 4. Ignore la première colonne (le Port) qui est en majuscules suivie d'un grand espace (.*?\s{2,})
         # 5. Capture le Code (2 lettres) + le Nom du pays ([A-Z]{2}\s+[a-zA-Z\s]+)
-        r"(?:Pays de provenance|Country)[\s\S]*?of Shipment[^\n]*\n(?:.*?\s{2,}|^\s*)([A-Z]{2}\s+[a-zA-Z\s]+)(?:\s{2,}|\n|$)",
+        r"(?:Pays de provenance|Country)" + LABEL_GAP + r"of Shipment[^\n]*\n(?:.*?\s{2,}|^\s*)([A-Z]{2}\s+[a-zA-Z\s]+)(?:\s{2,}|\n|$)",
 
         # Pattern 2 (Alternatif) : Si la ligne "of Shipment" est mal lue
         # Cherche la ligne contenant "Pays de provenance", saute une ligne, 
@@ -382,7 +1421,7 @@ class ImportDeclarationExtractor:
                     "patterns": [
                         r"MARITIME",
                         r"Transport\s*mode\s*\n\s*([A-Z]+)",
-                        r"Mode.*?transport.*?mode\s*\n\s*([A-Z]+)",
+                        r"Mode" + LABEL_GAP + r"transport" + LABEL_GAP + r"mode\s*\n\s*([A-Z]+)",
                     ]
                 },
                 "type_expedition": {
@@ -390,7 +1429,7 @@ class ImportDeclarationExtractor:
                     "patterns": [
                         r"TOTALE",
                         r"Delivery\s*Type\s*\n\s*([A-Z]+)",
-                        r"expédition.*?Type\s*\n\s*([A-Z]+)",
+                        r"expédition" + LABEL_GAP + r"Type\s*\n\s*([A-Z]+)",
                     ]
                 },
             },
@@ -460,7 +1499,7 @@ class ImportDeclarationExtractor:
         # Pattern 2 (Liste Blanche - Plus Sûr) :
         # Si vous connaissez les devises possibles, c'est le plus fiable.
         # Il cherche l'en-tête, puis cherche spécifiquement EUR, USD, CNY, GBP, XAF, etc.
-        r"Devise\s*/\s*Currency[\s\S]*?\n\s*(EUR|USD|GBP|CNY|XAF|CAD|CHF|JPY)\b",
+        r"Devise\s*/\s*Currency" + LABEL_GAP + r"\n\s*(EUR|USD|GBP|CNY|XAF|CAD|CHF|JPY)\b",
         
         # Pattern 3 (Contextuel avec la Valeur Totale) :
         # Capture le code 3 lettres qui se trouve juste avant ou au-dessus de la ligne contenant "**" et un montant.
@@ -471,7 +1510,7 @@ class ImportDeclarationExtractor:
                     "label": "Modalités de règlement",
                     "patterns": [
                         r"Transfert\s+bancaire",
-                        r"Method\s*of\s*settlement\s*\n\s*([A-Za-z\s]+?)(?=\n|No)",
+                        r"Method\s*of\s*settlement\s*\n\s*([A-Za-z\s]+?)(?:\n|No)",
                     ]
                 },
                 "facture_proforma_numero": {
@@ -642,7 +1681,7 @@ class ImportDeclarationExtractor:
                     "label": "Banque / Bank (taxe)",
                     "patterns": [
                         r"AFG\s+BANK\s+CAMEROUN",
-                        r"Taxe.*?Bank.*?\n.*?([A-Z]+\s+BANK\s+[A-Z]+)",
+                        r"Taxe" + LABEL_GAP + r"Bank" + LABEL_GAP + r"\n" + LABEL_GAP + r"([A-Z]+\s+BANK\s+[A-Z]+)",
                     ]
                 },
                 "date": {
@@ -702,8 +1741,117 @@ class ImportDeclarationExtractor:
                 },
             },
         }
+        self._compile_structure()
+
+    def _compile_structure(self):
+        """
+        Compile une fois pour toutes les patterns de la structure, rangés en tableaux parallèles
+        (self._patterns, un indice par pattern) ; chaque champ reçoit la plage de ses indices
+        (clé "pattern_ids") et la liste de ses patterns compilés (clé "compiled").
+        Les chaînes d'origine restent dans "patterns" pour l'affichage et le débogage.
+        """
+        # Vue à plat de la structure, parcourue par l'extraction : (section, champ, libellé, configuration)
+        self._fields = [
+            (section_name, field_name, field_config.get("label", ""), field_config)
+            for section_name, fields in self.structure.items()
+            for field_name, field_config in fields.items()
+        ]
+
+        pattern_strings = []
+        for _, _, _, field_config in self._fields:
+            field_patterns = field_config.get("patterns", [])
+            field_config["pattern_ids"] = range(len(pattern_strings), len(pattern_strings) + len(field_patterns))
+            pattern_strings.extend(map(pattern_source, field_patterns))
+        self._pattern_strings = tuple(pattern_strings)
+        self._patterns = pattern_table(self._pattern_strings)
+        for _, _, _, field_config in self._fields:
+            field_config["compiled"] = [self._patterns.compiled[i] for i in field_config["pattern_ids"]]
+
+        # Sentinelles de chaque section : si aucune n'est dans le texte, aucun pattern de la
+        # section ne peut correspondre (None si un pattern n'a pas de sentinelle)
+        section_sentinels = {}
+        for section_name, _, _, field_config in self._fields:
+            section_sentinels.setdefault(section_name, []).extend(
+                self._patterns.sentinels[i] for i in field_config["pattern_ids"])
+        self._section_sentinels = {
+            section_name: tuple(dict.fromkeys(sentinels)) if sentinels and None not in sentinels else None
+            for section_name, sentinels in section_sentinels.items()
+        }
+        # Toutes les sentinelles distinctes, cherchées une seule fois par texte (voir _present_literals)
+        self._literals = tuple(dict.fromkeys(s for s in self._patterns.sentinels if s is not None))
+
+        self._section_hs_ids = {}
+        self._hs_ids = []
+        self._hs_db = self._compile_hyperscan() if HAS_HYPERSCAN else None
+
+        # Empreinte des patterns : un changement de structure invalide les résultats en cache
+        digest = hashlib.blake2b(digest_size=8)
+        for section_name, fields in self.structure.items():
+            for field_name, field_config in fields.items():
+                digest.update(f"{section_name}.{field_name}".encode("utf-8"))
+                for pattern in field_config.get("patterns", []):
+                    digest.update(pattern_source(pattern).encode("utf-8") + b"\0")
+        self._structure_digest = digest.hexdigest()
+
+        # Nombre de champs et noms affichés des champs manquants, fixés par la structure
+        self._total_fields = len(self._fields)
+        self._field_keys = [
+            (section_name, field_name, f"{section_name}.{field_name}")
+            for section_name, field_name, _, _ in self._fields
+        ]
+
+        # Champs de chaque section, dans l'ordre de la structure : [(champ, configuration)]
+        self._section_fields = {}
+        for section_name, field_name, _, field_config in self._fields:
+            self._section_fields.setdefault(section_name, []).append((field_name, field_config))
+
+        # Colonnes CSV connues d'avance : (section, champ, colonne aplatie)
+        self._flat_keys = [
+            (section_name, field_name, f"{section_name}_{field_name}")
+            for section_name, field_name, _, _ in self._fields
+        ]
+        # En-tête CSV d'un résultat de la structure, dans l'ordre de ses colonnes (voir _csv_row)
+        self._csv_columns = [column for _, _, column in self._flat_keys]
     
     
+    def _compile_hyperscan(self):
+        """
+        Compile tous les patterns acceptés par Hyperscan dans une base unique ; self._hs_ids
+        donne l'identifiant de chaque pattern (None si le pattern reste hors base)
+        """
+        pattern_expressions = [hyperscan_expression(p) for p in self._pattern_strings]
+        expressions = tuple(dict.fromkeys(e for e in pattern_expressions if e is not None))
+        try:
+            db = hyperscan_database(expressions) if expressions else None
+        except hyperscan.error:
+            # Refus non détecté d'avance : on écarte une à une les expressions fautives (lent)
+            accepted = {e for e in expressions if hyperscan_accepts(e)}
+            pattern_expressions = [e if e in accepted else None for e in pattern_expressions]
+            expressions = tuple(e for e in expressions if e in accepted)
+            db = hyperscan_database(expressions) if expressions else None
+
+        ids = {expression: pattern_id for pattern_id, expression in enumerate(expressions)}
+        self._hs_ids = [ids.get(expression) for expression in pattern_expressions]
+        # Sections dont tous les patterns sont dans la base : (section -> identifiants)
+        section_ids = {}
+        for section_name, _, _, field_config in self._fields:
+            section_ids.setdefault(section_name, []).extend(self._hs_ids[i] for i in field_config["pattern_ids"])
+        for section_name, pattern_ids in section_ids.items():
+            if pattern_ids and None not in pattern_ids:
+                self._section_hs_ids[section_name] = frozenset(pattern_ids)
+        return db
+
+    def _hyperscan_candidates(self, text: str):
+        """Identifiants des patterns susceptibles de correspondre (un seul passage sur le texte), ou None"""
+        if self._hs_db is None or _HS_UNSAFE_CHARS.search(text):
+            return None
+        scratch = getattr(self._hs_local, "scratch", None)
+        if scratch is None or scratch.database is not self._hs_db:
+            scratch = self._hs_local.scratch = hyperscan.Scratch(self._hs_db)
+        found = set()
+        self._hs_db.scan(text.encode("utf-8"), match_event_handler=_record_match, context=found, scratch=scratch)
+        return found
+
     def extract_from_pdf(self, pdf_path: str, use_reconstruction: bool = None) -> str:
         """
         Extrait le texte d'un PDF avec méthode basique ou avancée
@@ -711,43 +1859,299 @@ class ImportDeclarationExtractor:
         """
         if use_reconstruction is None:
             use_reconstruction = self.use_advanced
-            
+
+        # Un contenu déjà lu (quel que soit son chemin) n'est pas réanalysé ; l'empreinte coûte
+        # une lecture du fichier, bien moins que son analyse
+        key = (file_digest(pdf_path), bool(use_reconstruction and ADVANCED_EXTRACTION),
+               self.text_engine, self.layout_engine)
+        if key in self._text_cache:
+            self._text_cache.move_to_end(key)
+            # Aucune reconstruction pour ce fichier : l'état d'un document précédent ne doit pas
+            # lui être attribué (tableaux, texte reconstruit)
+            self.reconstructor = None
+            return self._text_cache[key]
+        self.reconstructor = None
+        text = self._extract_pdf_text(pdf_path, use_reconstruction)
+        if self.reconstructor is not None and self.reconstructor.tables_failed:
+            return text  # Tableaux manquants : le prochain appel retente la lecture
+        self._text_cache[key] = text
+        if len(self._text_cache) > TEXT_CACHE_SIZE:
+            self._text_cache.popitem(last=False)
+        return text
+
+    def _extract_pdf_text(self, pdf_path: str, use_reconstruction: bool) -> str:
+        """Extraction effective du texte d'un PDF, sans passer par le cache d'extract_from_pdf"""
         if use_reconstruction and ADVANCED_EXTRACTION:
             try:
-                self.reconstructor = TextReconstructor(pdf_path)
+                self.reconstructor = TextReconstructor(pdf_path, parallel=self.page_workers > 1,
+                                                       max_workers=self.page_workers,
+                                                       engine=self.layout_engine,
+                                                       cache_dir=self.text_cache_dir)
                 return self.reconstructor.reconstruct()
             except Exception as e:
-                # Fallback sur PyPDF2 si l'extraction avancée échoue
+                # Fallback sur l'extraction basique si l'extraction avancée échoue
                 pass
         
-        # Extraction basique PyPDF2 (toujours disponible)
+        # Extraction basique (PyPDF2 ou PDFium, voir TEXT_ENGINES) : le fichier est lu en une fois,
+        # les nombreuses petites lectures du parseur se font ensuite en mémoire ; un gros fichier
+        # est projeté en mémoire (voir MMAP_THRESHOLD), le système ne charge que les pages lues
+        try:
+            if os.path.getsize(pdf_path) >= MMAP_THRESHOLD:
+                with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return self._extract_basic(mapped, pdf_path=pdf_path)
+            return self._extract_basic(io.BytesIO(read_pdf_bytes(pdf_path)))
+        except Exception as e:
+            raise Exception(f"Erreur lors de la lecture du PDF: {str(e)}")
+
+    def extract_from_pdf_stream(self, stream: BinaryIO, use_reconstruction: bool = None,
+                                spool_dir: Optional[str] = None) -> str:
+        """
+        Extrait le texte d'un PDF reçu sous forme d'objet fichier (upload Flask, BytesIO)
+        sans l'écrire sur disque. Camelot n'accepte qu'un chemin : en mode avancé le flux
+        est recopié dans un fichier temporaire de `spool_dir`, supprimé après lecture.
+        """
+        if use_reconstruction is None:
+            use_reconstruction = self.use_advanced
+
+        if use_reconstruction and ADVANCED_EXTRACTION:
+            with tempfile.NamedTemporaryFile(suffix='.pdf', dir=spool_dir, delete=False) as tmp:
+                tmp.write(stream.read())
+            try:
+                # Fichier temporaire lu une seule fois : inutile de le garder en cache
+                return self._extract_pdf_text(tmp.name, use_reconstruction=True)
+            finally:
+                os.remove(tmp.name)
+
         try:
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
+            return self._extract_basic(stream)
         except Exception as e:
             raise Exception(f"Erreur lors de la lecture du PDF: {str(e)}")
+
+    def extract_pdf_data(self, data: bytes, spool_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extrait les champs d'un PDF fourni en octets, avec mise en cache par empreinte du contenu :
+        un document déjà traité (même mode d'extraction, mêmes patterns) n'est ni relu ni analysé
+        """
+        key = (f"{content_hash(data).hexdigest()}:{self._structure_digest}:"
+               f"{int(self.use_advanced)}:{self.text_engine}:{self.layout_engine}")
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        text = self.extract_from_pdf_stream(io.BytesIO(data), spool_dir=spool_dir)
+        results = self.extract_all_fields(text)
+        self._cache_put(key, results)
+        return copy.deepcopy(results)
+
+    def _cache_connection(self):
+        """Connexion SQLite du processus courant (une connexion ne se partage pas après fork)"""
+        if self._cache_db is None or self._cache_db_pid != os.getpid():
+            self._cache_db = sqlite3.connect(self.cache_path, timeout=30)
+            self._cache_db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._cache_db_pid = os.getpid()
+        return self._cache_db
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        if key in self._result_cache:
+            self._result_cache.move_to_end(key)
+            return copy.deepcopy(self._result_cache[key])
+        if self.cache_path:
+            row = self._cache_connection().execute("SELECT data FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                results = json.loads(row[0])
+                self._remember(key, results)
+                return copy.deepcopy(results)
+        return None
+
+    def _cache_put(self, key: str, results: Dict[str, Any]):
+        self._remember(key, results)
+        if self.cache_path:
+            with self._cache_connection() as db:
+                db.execute("INSERT OR REPLACE INTO results (key, data) VALUES (?, ?)",
+                           (key, json.dumps(results, ensure_ascii=False)))
+
+    def _remember(self, key: str, results: Dict[str, Any]):
+        self._result_cache[key] = results
+        self._result_cache.move_to_end(key)
+        if len(self._result_cache) > RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+
+    def _extract_basic(self, file: BinaryIO, pdf_path: Optional[str] = None) -> str:
+        """
+        Extraction texte basique depuis un objet fichier : pypdfium2 (PDFium, C++) si ce moteur
+        est choisi et disponible, PyPDF2 sinon ou si PDFium refuse le document.
+        `pdf_path` : chemin du fichier, donné à PDFium (qui lit alors lui-même le fichier)
+        quand `file` est une projection mmap, que pypdfium2 n'accepte pas
+        """
+        if self.text_engine == "pdfium" and HAS_PDFIUM:
+            try:
+                return self._extract_pdfium(pdf_path if pdf_path is not None else file)
+            except Exception:
+                if not HAS_PYPDF2:
+                    raise
+                file.seek(0)
+        if not HAS_PYPDF2:
+            raise RuntimeError("Aucun moteur d'extraction de texte installé (PyPDF2 ou pypdfium2)")
+
+        reader = PyPDF2.PdfReader(file)
+        page_count = len(reader.pages)
+        if self.page_workers > 1 and page_count >= PARALLEL_PAGE_THRESHOLD:
+            # Pages réparties entre les processus ; map rend les textes dans l'ordre des pages
+            file.seek(0)
+            pdf_bytes = file.read()
+            texts = _page_executor(self.page_workers).map(_extract_page_text, repeat(pdf_bytes), range(page_count))
+            return "".join(page_text + "\n" for page_text in texts)
+
+        # Une page sans texte (image seule) peut rendre None : elle compte comme une page vide
+        return "".join((page.extract_text() or "") + "\n" for page in reader.pages)
     
-    def extract_field(self, text: str, field_config: Dict) -> Optional[str]:
-        """Extrait un champ spécifique en testant plusieurs patterns"""
-        patterns = field_config.get("patterns", [])
-        for pattern in patterns:
-            match = re.search(pattern, text, re.MULTILINE | re.DOTALL | re.IGNORECASE)
-            if match:
-                try:
-                    value = match.group(1).strip() if match.groups() else match.group(0).strip()
-                    # Nettoyage
-                    value = re.sub(r'\*+', '', value)
-                    value = re.sub(r'\s+', ' ', value)
-                    value = value.replace('\n', ' ').strip()
-                    if value:
-                        return value
-                except:
+    def _extract_pdfium(self, file: BinaryIO) -> str:
+        """Extraction texte avec pypdfium2 (même découpage que PyPDF2 : chaque page suivie d'un saut de ligne)"""
+        return "".join(page_text + "\n" for page_text in _pdfium_page_texts(file))
+
+    def extract_field(self, text: str, field_config: Dict, lowered: Optional[str] = None,
+                      candidates: Optional[set] = None, encoded=None,
+                      memo: Optional[dict] = None) -> Optional[str]:
+        """
+        Extrait un champ spécifique en testant plusieurs patterns
+        `lowered` : text.lower(), calculé une fois par document ; active le test des sentinelles
+        `candidates` : patterns retenus par le préfiltre Hyperscan (None = pas de préfiltre)
+        `encoded` : encode_text(text), calculé une fois par document ; active la recherche sur octets
+        `memo` : valeurs déjà obtenues sur ce texte par pattern, partagées entre champs
+        """
+        return self._search_field(text, field_config, lowered, candidates, encoded=encoded, memo=memo)[0]
+
+    def _search_field(self, text: str, field_config: Dict, lowered: Optional[str] = None,
+                      candidates: Optional[set] = None, limit: Optional[int] = None, encoded=None,
+                      memo: Optional[dict] = None, region: Optional[tuple] = None,
+                      order: Optional[List[int]] = None, literals: Optional[frozenset] = None):
+        """
+        Comme extract_field, mais renvoie (valeur, rang du pattern qui l'a fournie, fin de sa
+        correspondance dans le texte) ;
+        `limit` restreint la recherche aux `limit` premiers patterns, `region` (début, fin) à une
+        portion du texte (positions valables aussi pour `lowered`), `order` remplace l'ordre des
+        patterns du champ (identifiants de la structure, voir adaptive_order), `literals` les
+        sentinelles présentes dans le texte (_present_literals)
+        """
+        ids = field_config.get("pattern_ids")
+        if ids is not None:
+            table, hs_ids = self._patterns, self._hs_ids
+            if order is not None:
+                ids = order
+        else:
+            # Configuration fournie de l'extérieur : tableaux construits (et mis en cache) pour elle
+            table, hs_ids = pattern_table(tuple(map(pattern_source, field_config.get("patterns", [])))), None
+            ids = range(len(table.compiled))
+            literals = None
+        sentinels = table.sentinels if lowered is not None else None
+        # Test de présence des sentinelles : ensemble déjà calculé pour ce texte, sinon recherche dans le texte
+        haystack = literals if literals is not None else lowered
+        # Les positions de `lowered` ne valent pour `text` que si la mise en minuscules
+        # n'a pas changé la longueur (ex. 'İ' devient deux caractères)
+        prefixes = table.prefixes if lowered is not None and len(lowered) == len(text) else None
+        if candidates is None:
+            hs_ids = None
+        for rank, i in enumerate(ids[:limit]):
+            if hs_ids and hs_ids[i] is not None and hs_ids[i] not in candidates:
+                continue  # Écarté par Hyperscan : aucune correspondance possible
+            if sentinels and sentinels[i] is not None and sentinels[i] not in haystack:
+                continue  # Sous-chaîne obligatoire absente : le pattern ne peut pas correspondre
+            start, end = region if region else (0, len(text))
+            if self.anchor_window is not None and prefixes and table.anchors[i] is not None:
+                # Mode anchor_window : fenêtres autour des suites de tête, essayées dans l'ordre du texte
+                spans = self._anchor_windows(table.anchors[i], lowered, start, end, memo)
+            elif prefixes and prefixes[i] is not None:
+                literal, offset = prefixes[i]
+                found = lowered.find(literal, start, end)
+                if found < 0:
                     continue
-        return None
+                spans = ((max(start, found - offset), end),)
+            else:
+                spans = ((start, end),)
+            pattern = table.compiled[i]
+            value = None
+            for start, end in spans:
+                if memo is not None and (pattern, start, end) in memo:
+                    # Pattern partagé avec un champ déjà traité (ex. pays.origine / pays.provenance)
+                    value, match_end = memo[pattern, start, end]
+                else:
+                    match = self._match_pattern(table, i, text, encoded, start, end, memo)
+                    value = clean_value(match.group(1) if match.groups() else match.group(0)) if match else None
+                    match_end = match.end() if match else None
+                    if memo is not None:
+                        memo[pattern, start, end] = value, match_end
+                if value is not None:
+                    break
+            if value:
+                return value, rank, match_end
+        return None, None, None
+
+    def _anchor_windows(self, anchors: tuple, lowered: str, start: int, end: int,
+                        memo: Optional[dict]) -> List[tuple]:
+        """
+        Intervalles (début, fin) où chercher un pattern en mode anchor_window : de `décalage`
+        caractères avant chaque occurrence d'une de ses suites de tête (pattern_anchors) jusqu'à
+        la fin de la ligne située `anchor_window` caractères plus loin. Les intervalles qui se
+        chevauchent sont fusionnés : la première correspondance reste la plus à gauche.
+        Les occurrences de chaque suite sont relevées une fois par texte (dans `memo`).
+        """
+        windows = []
+        for literal, offset in anchors:
+            positions = memo.get(literal) if memo is not None else None
+            if positions is None:
+                positions = []
+                found = lowered.find(literal)
+                while found >= 0:
+                    positions.append(found)
+                    found = lowered.find(literal, found + 1)
+                if memo is not None:
+                    memo[literal] = positions  # Clé chaîne : distincte des clés (pattern, début, fin)
+            for found in positions:
+                if start <= found < end:
+                    line_end = lowered.find("\n", found + self.anchor_window, end)
+                    windows.append((max(start, found - offset), line_end if line_end >= 0 else end))
+        windows.sort()
+        merged = []
+        for window_start, window_end in windows:
+            if merged and window_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], window_end))
+            else:
+                merged.append((window_start, window_end))
+        return merged
+
+    def _match_pattern(self, table: PatternTable, i: int, text: str, encoded, start: int, end: int,
+                       memo: Optional[dict]):
+        """
+        Première correspondance du pattern `i` dans text[start:end], par le moteur le plus rapide
+        qui le prend en charge. Si un pattern de même squelette a déjà été cherché sur ce texte
+        (memo), l'intervalle de sa correspondance suffit : fullmatch n'y relit que ses propres groupes.
+        """
+        if encoded is not None and table.re2_compiled[i] is not None and not table.re2_rules[i] & encoded[1]:
+            engine, subject, options = table.re2_compiled[i], encoded[0], {}
+        elif (self.pattern_engine == "regex" and encoded is not None and table.bytes_rules[i] is not None
+              and not table.bytes_rules[i] & encoded[1] and compile_regex(table.compiled[i].pattern) is not None):
+            # Mêmes conditions que la recherche sur octets : texte Latin-1 sans caractère soumis
+            # aux règles Unicode du pattern, là où `regex` et `re` ne s'accordent pas forcément
+            engine, subject, options = compile_regex(table.compiled[i].pattern), text, {"concurrent": True}
+        elif encoded is not None and table.bytes_compiled[i] is not None and not table.bytes_rules[i] & encoded[1]:
+            engine, subject, options = table.bytes_compiled[i], encoded[0], {}
+        else:
+            engine, subject, options = table.compiled[i], text, {}
+        # Les positions sont les mêmes dans le texte et dans ses octets Latin-1 (un octet par caractère)
+        key = (table.skeletons[i], start, end) if memo is not None and table.skeletons[i] is not None else None
+        span = memo.get(key) if key is not None else None
+        if span is None:
+            header = table.headers[i]
+            if header is not None:
+                # Une seule tentative, ancrée sur la première occurrence de l'en-tête (voir pattern_header)
+                found = header.search(text, start, end)
+                match = engine.match(subject, found.start(), end, **options) if found else None
+            else:
+                match = engine.search(subject, start, end, **options)
+            if key is not None:
+                memo[key] = match.span() if match else ()
+            return match
+        return engine.fullmatch(subject, *span, **options) if span else None
     
     def extract_all_fields(self, text: str = None) -> Dict[str, Any]:
         """
@@ -758,75 +2162,314 @@ class ImportDeclarationExtractor:
             text = self.extracted_text
         else:
             self.extracted_text = text
+
+        # Même texte et mêmes options que l'appel précédent (ex. aperçu puis enregistrement) : résultats
+        # repris tels quels. Comparaison directe des chaînes (identité, longueur puis memcmp), sans
+        # empreinte à calculer. Pas en mode adaptive_order, dont les compteurs voient chaque document
+        options = (self.use_regions, self.anchor_window)
+        last = self._last_fields
+        if last is not None and not self.adaptive_order and last[1] == options and last[0] == text:
+            return copy.deepcopy(last[2])
             
-        results = {}
-        statistics = {
-            "total_fields": 0,
-            "extracted_fields": 0,
-            "missing_fields": [],
-            "extraction_rate": 0.0
-        }
+        results = {section_name: {} for section_name in self.structure}
+        lowered = text.lower()
+        candidates = self._hyperscan_candidates(text)
+        encoded = encode_text(text)
+        # Un pattern présent dans plusieurs champs n'est exécuté qu'une fois par texte
+        memo = {}
+        regions = self._split_regions(lowered) if self.use_regions and len(lowered) == len(text) else {}
+        literals = self._present_literals(lowered)
+        context = (text, lowered, candidates, encoded, memo, regions, literals)
+
+        sections = list(self._section_fields)
+        if (self.section_workers > 1 and self.pattern_engine == "regex"
+                and len(text) >= PARALLEL_SECTION_THRESHOLD):
+            # Sections indépendantes : le mémo partagé ne fait qu'éviter des recherches en double
+            executor = _section_executor(self.section_workers)
+            extracted = executor.map(self._extract_section, sections, repeat(context))
+        else:
+            extracted = map(self._extract_section, sections, repeat(context))
+
+        for section_name, (values, ranks) in zip(sections, extracted):
+            results[section_name] = values
+            if self.adaptive_order:
+                for field_name, rank in ranks.items():
+                    order = self._pattern_order.get((section_name, field_name))
+                    winner = (order or self.structure[section_name][field_name]["pattern_ids"])[rank]
+                    wins = self._pattern_wins.setdefault((section_name, field_name), {})
+                    wins[winner] = wins.get(winner, 0) + 1
+
+        if self.adaptive_order:
+            self._documents_seen += 1
+            if self._documents_seen % ADAPTIVE_RESORT_EVERY == 1:
+                self._resort_patterns()
         
-        for section_name, fields in self.structure.items():
-            results[section_name] = {}
-            for field_name, field_config in fields.items():
-                statistics["total_fields"] += 1
-                value = self.extract_field(text, field_config)
-                
+        results["_statistics"] = self._build_statistics(results)
+        if not self.adaptive_order:
+            self._last_fields = (text, options, results)
+            return copy.deepcopy(results)
+        return results
+
+    def _extract_section(self, section_name: str, context: tuple):
+        """
+        Valeurs des champs d'une section ({champ: valeur}) et rang du pattern gagnant de chaque
+        champ trouvé ; `context` regroupe ce qu'extract_all_fields prépare une fois par texte
+        """
+        text, lowered, candidates, encoded, memo, regions, literals = context
+        fields = self._section_fields[section_name]
+        if not self._section_present(section_name, lowered, candidates, literals):
+            return {field_name: "" for field_name, _ in fields}, {}
+        values, ranks = {}, {}
+        for field_name, field_config in fields:
+            order = self._pattern_order.get((section_name, field_name)) if self.adaptive_order else None
+            value, rank, _ = self._search_field(text, field_config, lowered, candidates, encoded=encoded,
+                                                memo=memo, region=regions.get(section_name), order=order,
+                                                literals=literals)
+            values[field_name] = value or ""
+            if value:
+                ranks[field_name] = rank
+        return values, ranks
+
+    def _resort_patterns(self):
+        """Patterns de chaque champ classés par victoires (tri stable : à égalité, ordre de la structure)"""
+        for section_name, field_name, _, field_config in self._fields:
+            wins = self._pattern_wins.get((section_name, field_name))
+            if wins:
+                self._pattern_order[section_name, field_name] = sorted(
+                    field_config["pattern_ids"], key=lambda i: -wins.get(i, 0))
+
+    def extract_fields_incremental(self, pages: Iterable[str]) -> Dict[str, Any]:
+        """
+        Extrait les champs au fil des pages : après chaque page, seuls les champs encore
+        ouverts sont cherchés dans le texte accumulé, et la lecture s'arrête dès que tous sont
+        définitifs. Un champ trouvé par son premier pattern est définitif ; trouvé par un pattern
+        suivant, il reste ouvert aux patterns prioritaires sur les pages suivantes, comme dans
+        extract_all_fields sur le texte complet. Une correspondance qui se termine dans la dernière
+        page lue peut encore changer avec la suivante (répétition qui se prolonge, tentative qui a
+        buté sur la fin du texte) : son pattern reste à essayer tant qu'une page entière ne l'a pas suivie.
+        """
+        results = {section_name: {field_name: "" for field_name in fields}
+                   for section_name, fields in self.structure.items()}
+        # (section, champ, configuration, nombre de patterns encore à essayer ; None = tous)
+        missing = [(section_name, field_name, field_config, None)
+                   for section_name, field_name, _, field_config in self._fields]
+        parts = []
+
+        for page_text in pages:
+            read_before = len(text) if parts else 0
+            parts.append(page_text + "\n")
+            text = "".join(parts)
+            lowered = text.lower()
+            candidates = self._hyperscan_candidates(text)
+            encoded = encode_text(text)
+            present = {}
+            memo = {}
+            literals = self._present_literals(lowered)
+            still_missing = []
+            for section_name, field_name, field_config, limit in missing:
+                if section_name not in present:
+                    present[section_name] = self._section_present(section_name, lowered, candidates, literals)
+                value, rank, end = None, None, None
+                if present[section_name]:
+                    value, rank, end = self._search_field(text, field_config, lowered, candidates, limit, encoded,
+                                                          memo, literals=literals)
                 if value:
                     results[section_name][field_name] = value
-                    statistics["extracted_fields"] += 1
-                else:
-                    results[section_name][field_name] = ""
-                    statistics["missing_fields"].append(f"{section_name}.{field_name}")
-        
-        # Calcul du taux d'extraction
-        if statistics["total_fields"] > 0:
-            statistics["extraction_rate"] = round(
-                (statistics["extracted_fields"] / statistics["total_fields"]) * 100, 2
-            )
-        
-        results["_statistics"] = statistics
+                    limit = rank + 1 if end >= read_before else rank
+                if limit != 0:
+                    still_missing.append((section_name, field_name, field_config, limit))
+            missing = still_missing
+            if not missing:
+                break
+
+        self.extracted_text = "".join(parts)
+        results["_statistics"] = self._build_statistics(results)
         return results
 
-    def save_to_csv(self, data: Dict[str, Any], output_path: str) -> str:
+    def extract_from_pdf_incremental(self, pdf_path: str) -> Dict[str, Any]:
+        """
+        Extraction basique (PyPDF2 ou PDFium selon text_engine) page par page avec arrêt anticipé :
+        les pages suivantes ne sont ni analysées ni parcourues par les regex une fois tous les champs trouvés
+        """
+        data = read_pdf_bytes(pdf_path)
+        if self.text_engine == "pdfium" and HAS_PDFIUM:
+            return self.extract_fields_incremental(_pdfium_page_texts(data))
+        if not HAS_PYPDF2:
+            raise RuntimeError("Aucun moteur d'extraction de texte installé (PyPDF2 ou pypdfium2)")
+        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        return self.extract_fields_incremental(page.extract_text() or "" for page in reader.pages)
+
+    def _split_regions(self, lowered: str) -> Dict[str, tuple]:
+        """
+        (début, fin) de chaque section repérée par son en-tête (SECTION_ANCHORS) : de l'en-tête
+        jusqu'à l'en-tête suivant dans le texte, élargi de REGION_MARGIN de part et d'autre
+        """
+        starts = {}
+        for section_name, anchor in self.SECTION_ANCHORS.items():
+            position = lowered.find(anchor)
+            if position >= 0:
+                starts[section_name] = position
+        positions = sorted(set(starts.values()))
+        regions = {}
+        for section_name, position in starts.items():
+            following = [p for p in positions if p > position]
+            end = following[0] + REGION_MARGIN if following else len(lowered)
+            regions[section_name] = (max(0, position - REGION_MARGIN), min(len(lowered), end))
+        return regions
+
+    def _present_literals(self, lowered: str) -> frozenset:
+        """
+        Sentinelles présentes dans le texte, toutes cherchées une seule fois : les champs et les
+        sections qui partagent une sentinelle ne reparcourent plus le texte
+        """
+        return frozenset(s for s in self._literals if s in lowered)
+
+    def _section_present(self, section_name: str, lowered: str, candidates: Optional[set],
+                         literals: Optional[frozenset] = None) -> bool:
+        """Faux si la section ne peut avoir aucune correspondance (sentinelles, puis préfiltre Hyperscan)"""
+        sentinels = self._section_sentinels.get(section_name)
+        haystack = literals if literals is not None else lowered
+        if sentinels is not None and not any(s in haystack for s in sentinels):
+            return False
+        section_ids = self._section_hs_ids.get(section_name) if candidates is not None else None
+        return section_ids is None or not section_ids.isdisjoint(candidates)
+
+    def _build_statistics(self, results: Dict[str, Any]) -> Dict[str, Any]:
+        """Statistiques d'extraction (champs trouvés, manquants, taux) d'après les résultats"""
+        # Total connu dès la construction : un seul passage pour les champs manquants
+        missing_fields = [key for section_name, field_name, key in self._field_keys
+                          if not results[section_name][field_name]]
+        total_fields = self._total_fields
+        extracted_fields = total_fields - len(missing_fields)
+        return {
+            "total_fields": total_fields,
+            "extracted_fields": extracted_fields,
+            "missing_fields": missing_fields,
+            # Calcul du taux d'extraction
+            "extraction_rate": round((extracted_fields / total_fields) * 100, 2) if total_fields > 0 else 0.0
+        }
+
+    def save_to_csv(self, data: Dict[str, Any], output_path: str, flat_data: Optional[Dict] = None) -> str:
         """
         Enregistre les données dans un fichier CSV
         Compatible avec app.py
+        `flat_data` : données déjà aplaties (sans _statistics) pour éviter de les recalculer
         """
-        clean_data = {k: v for k, v in data.items() if k != "_statistics"}
-        flat_data = self._flatten_dict(clean_data)
+        if flat_data is not None:
+            columns, row = flat_data.keys(), flat_data.values()
+        else:
+            # Résultat de la structure : colonnes précalculées, aucun dictionnaire aplati intermédiaire
+            row = self._csv_row(data)
+            if row is not None:
+                columns = self._csv_columns
+            else:
+                flat_data = self._flatten_results(data)
+                columns, row = flat_data.keys(), flat_data.values()
         
+        # En-tête et valeurs écrits comme deux listes, sans la correspondance clé -> colonne de DictWriter
         with open(output_path, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=flat_data.keys())
-            writer.writeheader()
-            writer.writerow(flat_data)
+            writer = csv.writer(csvfile)
+            writer.writerow(columns)
+            writer.writerow(row)
         
         return output_path
     
-    def save_to_json(self, data: Dict[str, Any], output_path: str) -> str:
+    def save_many_to_csv(self, data_list: List[Dict[str, Any]], output_path: str) -> str:
+        """
+        Enregistre plusieurs résultats d'extraction dans un seul fichier CSV (une ligne par document).
+        Le contenu est préparé en mémoire puis écrit en une fois.
+        """
+        rows = [self._csv_row(data) for data in data_list]
+        if rows and None not in rows:
+            fieldnames = self._csv_columns
+        else:
+            flat_rows = [self._flatten_results(data) for data in data_list]
+            # Union des colonnes dans l'ordre d'apparition (identiques pour des résultats de la même structure)
+            fieldnames = list(dict.fromkeys(key for row in flat_rows for key in row))
+            rows = [[row.get(key, '') for key in fieldnames] for row in flat_rows]
+
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+        with open(output_path, 'wb') as csvfile:
+            csvfile.write(buffer.getvalue().encode('utf-8-sig'))
+        
+        return output_path
+
+    def save_to_json(self, data: Dict[str, Any], output_path: str, pretty: bool = False,
+                     include_statistics: bool = False) -> str:
         """
         Enregistre les données dans un fichier JSON
         Compatible avec app.py
+        `pretty` : indentation de 2 pour un fichier lisible ; sinon sortie compacte, sans espaces
+        `include_statistics` : garde la clé _statistics ; sinon seules les sections sont écrites
+        (vue de premier niveau, les sections elles-mêmes ne sont pas copiées)
         """
-        with open(output_path, 'w', encoding='utf-8') as jsonfile:
-            json.dump(data, jsonfile, indent=4, ensure_ascii=False)
+        if not include_statistics and "_statistics" in data:
+            data = {k: v for k, v in data.items() if k != "_statistics"}
+        # Sérialisation complète en mémoire puis une seule écriture (orjson si disponible ;
+        # même mise en forme dans les deux cas pour un fichier identique)
+        if HAS_ORJSON:
+            option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+            payload = orjson.dumps(data, option=option)
+        elif pretty:
+            payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        else:
+            payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        with open(output_path, 'wb') as jsonfile:
+            jsonfile.write(payload)
         
         return output_path
 
-    def _flatten_dict(self, d: Dict, parent_key: str = '', sep: str = '_') -> Dict:
+    def _csv_row(self, data: Dict[str, Any]) -> Optional[List[Any]]:
+        """
+        Valeurs d'un résultat d'extract_all_fields dans l'ordre de self._csv_columns, ou None
+        s'il ne suit pas exactement la structure (mêmes sections, mêmes champs)
+        """
+        sections = [k for k in data if k != "_statistics"]
+        if sections != list(self.structure) or any(
+                not isinstance(data[s], dict) or len(data[s]) != len(self.structure[s]) for s in sections):
+            return None
+        try:
+            return [data[section][field] for section, field, _ in self._flat_keys]
+        except KeyError:
+            return None
+
+    def _flatten_results(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Aplatit un résultat d'extract_all_fields (sans _statistics) en suivant les colonnes
+        précalculées de la structure ; tout autre dictionnaire passe par _flatten_dict
+        """
+        row = self._csv_row(data)
+        if row is not None:
+            return dict(zip(self._csv_columns, row))
+        return self._flatten_dict(data)
+
+    def _flatten_dict(self, d: Dict, parent_key: str = '', sep: str = '_',
+                      skip_keys: frozenset = frozenset({"_statistics"})) -> Dict:
         """
         Aplatit un dictionnaire imbriqué pour CSV
         Compatible avec data_manager.py
+        Parcours itératif (pile d'itérateurs) écrivant directement dans le résultat : les clés
+        gardent l'ordre du parcours récursif, sans dictionnaire intermédiaire par niveau.
+        Les clés de premier niveau de `skip_keys` (statistiques techniques) sont ignorées en route
         """
-        items = []
-        for k, v in d.items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
+        flat = {}
+        stack = [(parent_key, ((k, v) for k, v in d.items() if k not in skip_keys))]
+        while stack:
+            prefix, items = stack[-1]
+            for k, v in items:
+                new_key = f"{prefix}{sep}{k}" if prefix else k
+                if isinstance(v, dict):
+                    # Le niveau courant reprendra après ce sous-dictionnaire
+                    stack.append((new_key, iter(v.items())))
+                    break
+                flat[new_key] = v
             else:
-                items.append((new_key, v))
-        return dict(items)
+                stack.pop()
+        return flat
     
     # def to_datamanager_format(self, data: Dict[str, Any]) -> Dict[str, str]:
     #     """
@@ -855,4 +2498,32 @@ class ImportDeclarationExtractor:
     #                       'fournisseur_name', 'details_fournisseur']:
     #             mapped[key] = value
         
-    #     return mapped
\ No newline at end of file
+    #     return mapped
+
+
+def _init_batch_worker(options: Dict[str, Any]):
+    """Initialisation d'un processus d'extract_batch : les patterns sont compilés une seule fois"""
+    global _BATCH_EXTRACTOR
+    # Les documents sont déjà répartis entre processus : pas de second pool par page
+    _BATCH_EXTRACTOR = ImportDeclarationExtractor(page_workers=1, **options)
+
+
+def _extract_batch_item(pdf_path: str) -> Dict[str, Any]:
+    text = _BATCH_EXTRACTOR.extract_from_pdf(pdf_path)
+    return _BATCH_EXTRACTOR.extract_all_fields(text)
+
+
+def extract_batch(paths: Iterable[Union[str, Path]], workers: Optional[int] = None,
+                  chunksize: int = 8, **options) -> List[Dict[str, Any]]:
+    """
+    Extrait les champs d'une série de PDF en les répartissant entre `workers` processus
+    (un document par tâche, pas de découpage par page). Les résultats sont rendus dans
+    l'ordre de `paths` ; `options` est transmis à ImportDeclarationExtractor.
+    """
+    paths = [str(path) for path in paths]
+    if not paths:
+        return []
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                             initargs=(options,)) as executor:
+        return list(executor.map(_extract_batch_item, paths, chunksize=chunksize))
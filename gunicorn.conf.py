@@ -0,0 +1,37 @@
+"""
+Configuration gunicorn pour la production :
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Équivalent de `gunicorn -k gthread -w 1 --threads 4 --max-requests 1000 app:app`.
+Chaque valeur peut être surchargée par variable d'environnement.
+"""
+import os
+
+bind = os.environ.get('OCR_BIND', '0.0.0.0:5000')
+
+# Un seul worker par défaut : l'extraction tourne dans le pool de processus de chaque worker
+# (app.EXTRACT_WORKERS, un processus par cœur), N workers feraient N pools et ~N² processus.
+# Les threads servent les requêtes, qui attendent surtout les E/S et le pool.
+# app.py relit OCR_WORKERS pour partager les cœurs entre les pools.
+workers = int(os.environ.get('OCR_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('OCR_THREADS', 4))
+
+# Recyclage périodique des workers (fuites mémoire des bibliothèques PDF)
+max_requests = int(os.environ.get('OCR_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# Les extractions de gros PDF peuvent être longues
+timeout = int(os.environ.get('OCR_TIMEOUT', 120))
+
+# Le module (structure des regex, extracteur) est chargé une fois par le maître puis
+# partagé par fork ; descripteurs et thread d'écriture sont ouverts paresseusement dans
+# chaque worker (voir app.ensure_master_writer)
+preload_app = True
+
+
+def worker_exit(server, worker):
+    """Vide la file des écritures maîtres avant la sortie du worker"""
+    from app import stop_master_writer
+    stop_master_writer()
@@ -0,0 +1,147 @@
+"""
+Analyse hors ligne des patterns de l'extracteur sur un corpus de documents (PDF ou .txt).
+
+Pour chaque champ, compte le pattern qui fournit la valeur (premier pattern gagnant, comme
+dans extract_all_fields) et signale les patterns qui n'apportent jamais de valeur : candidats
+à la suppression. L'ordre proposé classe les patterns par nombre de victoires.
+
+Chaque pattern est lancé seul avec les mêmes préfiltres que l'extraction (sentinelles, début
+littéral, Hyperscan) et une limite de durée par document : un pattern à retour arrière
+catastrophique est interrompu et signalé dans "pathological" au lieu de bloquer l'analyse.
+
+Usage : python scripts/prune_patterns.py echantillons/*.pdf [--basic] [--timeout 2] [-o rapport.json]
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor import ImportDeclarationExtractor, encode_text
+
+# Durée maximale (secondes) d'une recherche d'un pattern sur un document
+DEFAULT_TIMEOUT = 2.0
+
+
+class PatternTimeout(Exception):
+    pass
+
+
+def _interrupt(signum, frame):
+    raise PatternTimeout()
+
+
+def load_text(extractor: ImportDeclarationExtractor, path: str) -> str:
+    if path.lower().endswith('.txt'):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    return extractor.extract_from_pdf(path)
+
+
+def solo_search(extractor: ImportDeclarationExtractor, context, field_config, pattern_id, timeout):
+    """
+    Valeur trouvée par un seul pattern (identifiant de la structure), avec les préfiltres de
+    l'extraction ; PatternTimeout au-delà de `timeout` secondes (SIGALRM, que `re` vérifie
+    pendant son parcours ; pas de limite là où le signal n'existe pas)
+    """
+    text, lowered, candidates, encoded, literals = context
+    use_alarm = timeout and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        value, _, _ = extractor._search_field(text, field_config, lowered, candidates, encoded=encoded,
+                                              order=[pattern_id], literals=literals)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    return value
+
+
+def analyse(extractor: ImportDeclarationExtractor, paths, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Victoires par pattern, valeurs trouvées par chaque pattern seul et recherches interrompues,
+    pour chaque champ
+    """
+    wins = {}
+    solo_hits = {}
+    timeouts = {}
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _interrupt)
+    for path in paths:
+        text = load_text(extractor, path)
+        lowered = text.lower()
+        context = (text, lowered, extractor._hyperscan_candidates(text), encode_text(text),
+                   extractor._present_literals(lowered))
+        for section_name, field_name, _, field_config in extractor._fields:
+            key = f"{section_name}.{field_name}"
+            wins.setdefault(key, Counter())
+            hits = solo_hits.setdefault(key, Counter())
+            stalled = timeouts.setdefault(key, Counter())
+            # Chaque pattern essayé seul : correspond-il quand un autre a déjà gagné ?
+            # Le premier qui trouve une valeur est celui qui gagne dans extract_all_fields
+            winner = None
+            for i, pattern_id in enumerate(field_config["pattern_ids"]):
+                try:
+                    value = solo_search(extractor, context, field_config, pattern_id, timeout)
+                except PatternTimeout:
+                    stalled[i] += 1
+                    continue
+                if value:
+                    hits[i] += 1
+                    if winner is None:
+                        winner = i
+            if winner is not None:
+                wins[key][winner] += 1
+    return wins, solo_hits, timeouts
+
+
+def report(extractor: ImportDeclarationExtractor, paths, timeout: float = DEFAULT_TIMEOUT):
+    wins, solo_hits, timeouts = analyse(extractor, paths, timeout)
+    fields = {}
+    pathological = []
+    for section_name, field_name, _, field_config in extractor._fields:
+        key = f"{section_name}.{field_name}"
+        patterns = field_config.get("patterns", [])
+        # Patterns interrompus : à réécrire quel que soit le nombre de patterns du champ
+        for i, count in sorted(timeouts[key].items()):
+            pathological.append({"field": key, "pattern": i,
+                                 "source": extractor._patterns.compiled[field_config["pattern_ids"][i]].pattern,
+                                 "timeouts": count})
+        if len(patterns) < 2:
+            continue
+        # Tri stable : à égalité, l'ordre actuel (donc la priorité) est conservé
+        order = sorted(range(len(patterns)), key=lambda i: -wins[key][i])
+        fields[key] = {
+            "wins": {i: wins[key][i] for i in range(len(patterns))},
+            "solo_hits": {i: solo_hits[key][i] for i in range(len(patterns))},
+            "never_wins": [i for i in range(len(patterns)) if not wins[key][i]],
+            "suggested_order": order,
+        }
+        if timeouts[key]:
+            fields[key]["timeouts"] = {i: timeouts[key][i] for i in range(len(patterns))}
+    return {"documents": len(paths), "timeout": timeout, "pathological": pathological, "fields": fields}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Repère les patterns qui ne fournissent jamais de valeur")
+    parser.add_argument("paths", nargs="+", help="Documents d'exemple (PDF ou texte déjà extrait)")
+    parser.add_argument("--basic", action="store_true", help="Extraction basique (sans reconstruction)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Durée maximale d'un pattern sur un document, en secondes (0 : sans limite)")
+    parser.add_argument("-o", "--output", help="Fichier JSON du rapport (sortie standard sinon)")
+    args = parser.parse_args()
+
+    extractor = ImportDeclarationExtractor(use_advanced_extraction=not args.basic, page_workers=1)
+    result = json.dumps(report(extractor, args.paths, args.timeout), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(result)
+    else:
+        print(result)
+
+
+if __name__ == "__main__":
+    main()